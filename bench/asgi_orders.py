@@ -0,0 +1,211 @@
+"""
+Скільки одночасних заявок (POST /order/) витримує один воркер: ASGI (async views,
+один event loop — як один воркер uvicorn) проти WSGI (синхронний воркер gunicorn,
+--wsgi-threads потоків; 1 — класичний sync worker).
+
+Застосунок викликається прямо в процесі (scope/environ без мережі), тож цифри —
+це вартість Django + БД без парсингу HTTP. Для кожного --concurrency N клієнтів
+шлють заявки без пауз, поки не відправлять --requests штук; час клієнта включає
+чергу до воркера.
+
+    python bench/asgi_orders.py --concurrency 1,8,32,64 --requests 400
+    python bench/asgi_orders.py --wsgi-threads 4 --json orders.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("asgi", "wsgi")
+CSRF_SECRET = "b" * 32  # неперемаскований секрет: Django приймає однаковий у кукі та заголовку
+
+
+def _setup(mode):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ["ASYNC_VIEWS"] = str(mode == "asgi")
+    os.environ["RATELIMIT_ENABLED"] = "False"  # інакше з одного IP швидко впреться в 429
+    os.environ["TELEGRAM_SENDER_THREAD"] = "False"
+    os.environ["PERF_ENABLED"] = "False"
+    import django
+
+    django.setup()
+
+
+def _seed(n_tracks):
+    from django.core.management import call_command
+
+    from tracks.models import Track
+
+    call_command("migrate", verbosity=0)
+    Track.objects.bulk_create(
+        [
+            Track(title=f"Bench {i}", youtube_url=f"https://youtu.be/o{i:010d}", video_id=f"o{i:010d}",
+                  slug=f"bench-{i}")
+            for i in range(n_tracks)
+        ],
+        batch_size=1000,
+    )
+    return list(Track.objects.values_list("pk", flat=True))
+
+
+def _body(pks, i):
+    from tracks.forms import make_started_token
+
+    return urlencode({
+        "name": "Bench", "contact": "@bench_user", "license_type": "exclusive",
+        "track": pks[i % len(pks)], "started": make_started_token(time.time() - 10),
+    }).encode()
+
+
+async def _call_asgi(app, body):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/order/", "raw_path": b"/order/", "query_string": b"",
+        "server": ("127.0.0.1", 80), "client": ("127.0.0.1", 50000),
+        "headers": [
+            (b"host", b"127.0.0.1"), (b"user-agent", b"Mozilla/5.0 (bench)"),
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+            (b"cookie", f"csrftoken={CSRF_SECRET}".encode()), (b"x-csrftoken", CSRF_SECRET.encode()),
+        ],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()  # клієнт не відключається — Django сам скасує очікування
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def _call_wsgi(app, body):
+    environ = {}
+    setup_testing_defaults(environ)
+    environ.update({
+        "REQUEST_METHOD": "POST", "PATH_INFO": "/order/", "QUERY_STRING": "",
+        "HTTP_HOST": "127.0.0.1", "HTTP_USER_AGENT": "Mozilla/5.0 (bench)",
+        "CONTENT_TYPE": "application/x-www-form-urlencoded", "CONTENT_LENGTH": str(len(body)),
+        "HTTP_COOKIE": f"csrftoken={CSRF_SECRET}", "HTTP_X_CSRFTOKEN": CSRF_SECRET,
+        "wsgi.input": io.BytesIO(body),
+    })
+    status = []
+    result = app(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return int(status[0].split()[0])
+
+
+async def _level(mode, app, executor, pks, concurrency, n_requests):
+    counter = iter(range(n_requests))
+    latencies, errors = [], 0
+    loop = asyncio.get_running_loop()
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            body = _body(pks, i)
+            started = time.perf_counter()
+            if mode == "asgi":
+                status = await _call_asgi(app, body)
+            else:
+                status = await loop.run_in_executor(executor, _call_wsgi, app, body)
+            latencies.append(time.perf_counter() - started)
+            errors += status != 302
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 2),
+        "errors": errors,
+    }
+
+
+def run_mode(mode, levels, n_requests, n_tracks, wsgi_threads):
+    """Виконується в дочірньому процесі: ASYNC_VIEWS читається при імпорті urls."""
+    _setup(mode)
+    pks = _seed(n_tracks)
+    if mode == "asgi":
+        from django.core.asgi import get_asgi_application
+
+        app, executor = get_asgi_application(), None
+    else:
+        from django.core.wsgi import get_wsgi_application
+
+        app, executor = get_wsgi_application(), ThreadPoolExecutor(wsgi_threads)
+
+    async def main():
+        await _level(mode, app, executor, pks, 4, 40)  # прогрів
+        return {str(c): await _level(mode, app, executor, pks, c, n_requests) for c in levels}
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,64", help="скільки клієнтів одночасно, через кому")
+    parser.add_argument("--requests", type=int, default=400, help="заявок на кожен рівень")
+    parser.add_argument("--tracks", type=int, default=500)
+    parser.add_argument("--wsgi-threads", type=int, default=1)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", help="куди записати результати")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # внутрішнє: один режим у дочірньому процесі
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    if args.run:
+        print(json.dumps(run_mode(args.run, levels, args.requests, args.tracks, args.wsgi_threads)))
+        return
+
+    results = {}
+    for mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "SQLITE_PROFILE": os.environ.get("SQLITE_PROFILE", "production"),
+                   "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3"),
+                   "SHARED_STATE_DB": os.path.join(tmp, "shared.sqlite3")}
+            out = subprocess.run(
+                [sys.executable, __file__, "--run", mode, "--concurrency", args.concurrency,
+                 "--requests", str(args.requests), "--tracks", str(args.tracks),
+                 "--wsgi-threads", str(args.wsgi_threads)],
+                env=env, check=True, capture_output=True, text=True,
+            )
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'режим':<8}{'клієнтів':>10}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'помилки':>9}")
+    for mode, levels_result in results.items():
+        for concurrency, r in levels_result.items():
+            print(f"{mode:<8}{concurrency:>10}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['errors']:>9}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "requests": args.requests, "wsgi_threads": args.wsgi_threads, "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
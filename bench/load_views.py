@@ -0,0 +1,277 @@
+"""
+Навантажувальний бенчмарк публічних сторінок через справжній WSGI-застосунок.
+
+Сідить синтетичний каталог (жанри з Zipf-розподілом, male/female ~ навпіл),
+потім для кожної сторінки ганяє --requests запитів з кожного з --workers
+процесів і рахує p50/p95/p99, запити/с і середню кількість SQL-запитів.
+
+    python bench/load_views.py --tracks 10000 --workers 4 --json bench-10k.json
+    python bench/load_views.py --tracks 10000 --db /tmp/bench-10k.sqlite3 --compare bench-10k.json
+
+--db з уже засідженою базою пропускає сідинг. --compare порівнює з попереднім
+JSON і завершується з кодом 1, якщо p95 виріс більше ніж на --threshold
+(частка) або зросла кількість SQL-запитів.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+ROOT = Path(__file__).resolve().parent.parent
+GENRES = [
+    "trap", "drill", "boom bap", "lofi", "r&b", "pop", "rock", "phonk", "afrobeat", "dancehall",
+    "jersey club", "plugg", "rage", "uk garage", "house", "techno", "ambient", "jazz", "soul", "funk",
+    "emo", "sad", "dark", "melodic", "hard", "chill", "piano", "guitar", "orchestral", "synthwave",
+]
+WORDS = "night city cold warm dream wave drive fire ghost moon rain smoke gold neon storm".split()
+CSRF_SECRET = "b" * 32  # неперемаскований секрет: Django приймає однаковий у кукі та заголовку
+
+
+def _setup(args):
+    sys.path.insert(0, str(ROOT))
+    os.environ["SQLITE_PATH"] = args.db
+    os.environ.setdefault("SQLITE_PROFILE", "production")  # як на сервері
+    os.environ["SHARED_STATE_DB"] = args.db + ".shared"  # версія каталогу й кеш сторінок — від цієї ж бази
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ["RATELIMIT_ENABLED"] = "False"  # інакше POST /order/ швидко впреться в 429
+    os.environ["TELEGRAM_SENDER_THREAD"] = "False"
+    os.environ["PAGE_CACHE_ENABLED"] = str(not args.no_page_cache)
+    os.environ.setdefault("RATELIMIT_DB", os.path.join(tempfile.gettempdir(), "bench-ratelimit.sqlite3"))
+    import django
+
+    django.setup()
+
+
+def seed(n_tracks, with_related, rnd):
+    from django.core.management import call_command
+
+    from tracks import related, search
+    from tracks.models import Genre, Track, recount_genre_tracks
+
+    call_command("migrate", verbosity=0)
+    if Track.objects.exists():
+        print(f"База вже засіджена: {Track.objects.count()} треків")
+        return
+
+    started = time.monotonic()
+    genres = Genre.objects.bulk_create(
+        [Genre(name=name, slug=name.replace(" ", "-").replace("&", "")) for name in ["male", "female", *GENRES]]
+    )
+    gender, others = genres[:2], genres[2:]
+    weights = [1 / (i + 1) for i in range(len(others))]  # Zipf: trap частий, synthwave рідкісний
+
+    through = Track.genres.through
+    for start in range(0, n_tracks, 5000):
+        batch, tags = [], []
+        for i in range(start, min(start + 5000, n_tracks)):
+            picked = {rnd.choice(gender), *rnd.choices(others, weights, k=rnd.randint(1, 4))}
+            title = " ".join(rnd.sample(WORDS, 2)).title() + f" {i}"
+            batch.append(Track(
+                title=title, youtube_url=f"https://youtu.be/x{i:010d}", video_id=f"x{i:010d}",
+                slug=f"bench-{i}", description=", ".join(g.name for g in picked), is_featured=rnd.random() < 0.05,
+            ))
+            tags.append(picked)
+        Track.objects.bulk_create(batch)
+        through.objects.bulk_create(
+            [through(track_id=t.pk, genre_id=g.pk) for t, picked in zip(batch, tags) for g in picked]
+        )
+    recount_genre_tracks()
+    search.rebuild()
+    if with_related:
+        related.rebuild_all()
+    print(f"Засіджено {n_tracks} треків за {time.monotonic() - started:.1f} с")
+
+
+def scenarios(rnd):
+    """name → функція, що повертає (method, path, body)."""
+    from tracks.forms import make_started_token
+    from tracks.models import Genre, Track
+    from tracks.views import PAGE_SIZE_DEFAULT
+
+    slugs = list(Track.objects.order_by("?").values_list("slug", flat=True)[:500])
+    ids = list(Track.objects.order_by("?").values_list("pk", flat=True)[:500])
+    top = Genre.objects.order_by("-track_count").values_list("slug", flat=True)[2]  # не male/female
+    deep_page = max(Track.objects.count() // PAGE_SIZE_DEFAULT // 2, 1)
+
+    def order_post():
+        body = urlencode({
+            "name": "Bench", "contact": "@bench_user", "license_type": "exclusive",
+            "track": rnd.choice(ids), "started": make_started_token(time.time() - 10),
+        })
+        return "POST", "/order/", body.encode()
+
+    return {
+        "home": lambda: ("GET", "/", b""),
+        "catalog": lambda: ("GET", "/catalog/", b""),
+        "catalog_genre": lambda: ("GET", f"/catalog/?genre={top}", b""),
+        "catalog_deep": lambda: ("GET", f"/catalog/?page={deep_page}", b""),
+        "catalog_search": lambda: ("GET", f"/catalog/?q={rnd.choice(WORDS)[:3]}", b""),
+        "track_detail": lambda: ("GET", f"/track/{rnd.choice(slugs)}/", b""),
+        "order_get": lambda: ("GET", f"/order/?track={rnd.choice(ids)}", b""),
+        "order_post": order_post,
+        "sitemap": lambda: ("GET", "/sitemap.xml", b""),
+    }
+
+
+def call(app, method, path, body=b""):
+    environ = {}
+    setup_testing_defaults(environ)
+    path, _, query = path.partition("?")
+    environ.update({
+        "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+        "HTTP_HOST": "127.0.0.1", "HTTP_USER_AGENT": "Mozilla/5.0 (bench)",
+        "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body)),
+    })
+    if method == "POST":
+        environ.update({
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+            "HTTP_COOKIE": f"csrftoken={CSRF_SECRET}", "HTTP_X_CSRFTOKEN": CSRF_SECRET,
+        })
+    status = []
+    result = app(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return int(status[0].split()[0])
+
+
+_worker_state = {}
+
+
+def _init_worker(seed_value):
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    rnd = random.Random(seed_value + os.getpid())
+    queries = [0]
+
+    def count(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    connection.execute_wrappers.append(count)
+    _worker_state.update(app=get_wsgi_application(), rnd=rnd, queries=queries, scenarios=scenarios(rnd))
+
+
+def _run(args):
+    name, n = args
+    state = _worker_state
+    make = state["scenarios"][name]
+    latencies, queries, errors = [], [], 0
+    for _ in range(n):
+        method, path, body = make()
+        before = state["queries"][0]
+        started = time.perf_counter()
+        status = call(state["app"], method, path, body)
+        latencies.append(time.perf_counter() - started)
+        queries.append(state["queries"][0] - before)
+        errors += status >= 400
+    return latencies, queries, errors
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p), len(sorted_values) - 1)]
+
+
+def run(args):
+    from django.db import connections
+
+    connections.close_all()  # воркери після fork відкривають власні з'єднання
+    results = {}
+    with multiprocessing.get_context("fork").Pool(args.workers, _init_worker, (args.seed,)) as pool:
+        for name in args.views or scenarios(random.Random(args.seed)):
+            pool.map(_run, [(name, args.warmup)] * args.workers)
+            started = time.perf_counter()
+            chunks = pool.map(_run, [(name, args.requests)] * args.workers)
+            elapsed = time.perf_counter() - started
+            latencies = sorted(x for c in chunks for x in c[0])
+            queries = [x for c in chunks for x in c[1]]
+            results[name] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+                "queries": round(sum(queries) / len(queries), 2),
+                "errors": sum(c[2] for c in chunks),
+            }
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']} → {r['p95_ms']} ms")
+        if r["queries"] > base["queries"]:
+            regressions.append(f"{name}: SQL-запитів {base['queries']} → {r['queries']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--db", help="файл SQLite (за замовчуванням — тимчасовий)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="запитів на сторінку з кожного воркера")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--views", nargs="*", help="лише ці сценарії")
+    parser.add_argument("--no-page-cache", action="store_true")
+    parser.add_argument("--skip-related", action="store_true", help="не рахувати RelatedTrack (довго на 100k)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="куди записати результати")
+    parser.add_argument("--compare", help="JSON попереднього прогону")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимий ріст p95 (частка)")
+    args = parser.parse_args()
+
+    tmp = None
+    if not args.db:
+        tmp = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp.name, "bench.sqlite3")
+    _setup(args)
+    seed(args.tracks, not args.skip_related, random.Random(args.seed))
+
+    results = run(args)
+    print(f"{'сценарій':<16}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL':>7}{'помилки':>9}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['queries']:>7}{r['errors']:>9}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "commit": _git_commit(), "tracks": args.tracks, "workers": args.workers,
+            "requests": args.requests, "page_cache": not args.no_page_cache, "results": results,
+        }, indent=2))
+    if tmp:
+        tmp.cleanup()
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        for line in regressions:
+            print("РЕГРЕСІЯ:", line)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Конкурентне навантаження на SQLite: кілька процесів одночасно читають каталог,
+інкрементують view_count (як flush_counters) і створюють заявки (як order_page).
+
+Порівнює профілі з config/settings.py (SQLITE_PROFILE): стандартний Django
+проти production (WAL, busy_timeout, BEGIN IMMEDIATE, pragmas). Кожен профіль
+ганяється на окремій свіжій базі у тимчасовій теці.
+
+    python bench/sqlite_contention.py --workers 8 --seconds 10
+    python bench/sqlite_contention.py --json results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PROFILES = ("default", "production")
+
+
+def _setup():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    import django
+
+    django.setup()
+
+
+def _seed(n_tracks):
+    from django.core.management import call_command
+
+    from tracks.models import Track
+
+    call_command("migrate", verbosity=0)
+    Track.objects.bulk_create(
+        [
+            Track(title=f"Bench {i}", youtube_url=f"https://youtu.be/b{i:010d}", video_id=f"b{i:010d}",
+                  slug=f"bench-{i}", is_featured=i % 7 == 0)
+            for i in range(n_tracks)
+        ],
+        batch_size=1000,
+    )
+    return list(Track.objects.values_list("pk", flat=True))
+
+
+def _worker(args):
+    pks, seconds, seed = args
+    from django.db import OperationalError, connection, transaction
+    from django.db.models import F
+
+    from tracks.models import Inquiry, Track
+
+    rnd = random.Random(seed)
+    stats = {"reads": 0, "view_updates": 0, "inquiries": 0, "locked": 0, "errors": 0, "latencies": []}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        roll = rnd.random()
+        started = time.perf_counter()
+        try:
+            if roll < 0.7:
+                list(Track.objects.order_by("-is_featured", "-created_at")[:21])
+                stats["reads"] += 1
+            elif roll < 0.9:
+                with transaction.atomic():
+                    Track.objects.filter(pk=rnd.choice(pks)).update(view_count=F("view_count") + 1)
+                stats["view_updates"] += 1
+            else:
+                # читання, потім запис в одній транзакції — як ModelForm.save() з FK-треком
+                with transaction.atomic():
+                    track = Track.objects.filter(pk=rnd.choice(pks)).first()
+                    Inquiry.objects.create(name="Bench", contact="@bench", license_type="exclusive",
+                                           message="", track=track)
+                stats["inquiries"] += 1
+        except OperationalError as e:
+            stats["locked" if "locked" in str(e) else "errors"] += 1
+        stats["latencies"].append(time.perf_counter() - started)
+    connection.close()
+    return stats
+
+
+def run_profile(workers, seconds, n_tracks):
+    """Виконується в дочірньому процесі з уже виставленими SQLITE_PROFILE / SQLITE_PATH."""
+    _setup()
+    from django.db import connections
+
+    pks = _seed(n_tracks)
+    connections.close_all()  # кожен форкнутий воркер відкриє власне з'єднання
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        results = pool.map(_worker, [(pks, seconds, i) for i in range(workers)])
+
+    total = {k: sum(r[k] for r in results) for k in ("reads", "view_updates", "inquiries", "locked", "errors")}
+    latencies = sorted(x for r in results for x in r["latencies"])
+    attempts = len(latencies)
+    ok = total["reads"] + total["view_updates"] + total["inquiries"]
+    return {
+        **total,
+        "ops_per_sec": round(ok / seconds, 1),
+        "lock_error_rate": round(total["locked"] / attempts, 4) if attempts else 0.0,
+        "p50_ms": round(latencies[attempts // 2] * 1000, 2) if attempts else None,
+        "p99_ms": round(latencies[int(attempts * 0.99)] * 1000, 2) if attempts else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--json", help="куди записати результати")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # внутрішнє: один профіль у дочірньому процесі
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_profile(args.workers, args.seconds, args.tracks)))
+        return
+
+    results = {}
+    for profile in args.profiles.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "SQLITE_PROFILE": profile, "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3"),
+                   "SHARED_STATE_DB": os.path.join(tmp, "shared.sqlite3")}
+            out = subprocess.run(
+                [sys.executable, __file__, "--run", profile, "--workers", str(args.workers),
+                 "--seconds", str(args.seconds), "--tracks", str(args.tracks)],
+                env=env, check=True, capture_output=True, text=True,
+            )
+            results[profile] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'профіль':<12}{'ops/s':>10}{'reads':>9}{'updates':>9}{'inquiries':>11}{'locked':>8}{'lock %':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for profile, r in results.items():
+        print(f"{profile:<12}{r['ops_per_sec']:>10}{r['reads']:>9}{r['view_updates']:>9}{r['inquiries']:>11}"
+              f"{r['locked']:>8}{r['lock_error_rate'] * 100:>7.2f}%{r['p50_ms']:>9}{r['p99_ms']:>9}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"workers": args.workers, "seconds": args.seconds,
+                                               "tracks": args.tracks, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
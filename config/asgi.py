@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')  # async-версії публічних сторінок (tracks/views.py)
+# і навіть із ASYNC_VIEWS=False: під ASGI синхронні view теж ідуть через потоки
+os.environ['SQLITE_CONN_MAX_AGE'] = '0'
 
 application = get_asgi_application()
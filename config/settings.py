@@ -7,6 +7,10 @@ load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+# для офлайн-тестів: manage.py fake_telegram → http://127.0.0.1:8081
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+# False — відправляє лише окремий воркер manage.py send_notifications
+TELEGRAM_SENDER_THREAD = os.getenv("TELEGRAM_SENDER_THREAD", "True") == "True"
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,7 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tracks.perf.PerfMiddleware',  # першим — щоб міряти й решту middleware
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',  # до всіх, хто пише тіло відповіді
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,18 +58,28 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # скомпільовані шаблони — в пам'яті процесу і в DEBUG теж (там autoreload їх скидає)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# async-версії home / catalog / track_detail / order (tracks/views.py); config/asgi.py вмикає
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -71,10 +87,40 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Профіль SQLite для кількох воркерів: WAL (читачі не блокують писача), очікування
+# блокування замість миттєвого "database is locked", BEGIN IMMEDIATE для atomic-блоків
+# (писач бере lock одразу, а не падає на апгрейді з читання) і постійні з'єднання.
+# Вмикається явно: SQLITE_PROFILE=production у середовищі сервера. За замовчуванням —
+# стандартні налаштування Django, щоб manage.py test / runserver не переводили
+# закомічену db.sqlite3 у WAL (і не лишали поруч -wal / -shm).
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+if SQLITE_PROFILE == "production":
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.getenv("SQLITE_CONN_MAX_AGE", 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,  # busy_timeout, сек
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'  # 128 МБ
+                'PRAGMA cache_size=-20000;'  # ~20 МБ
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    })
+
+# async views ходять в ORM через sync_to_async: постійні з'єднання там не перевикористовуються,
+# а копляться по потоках (див. "Persistent connections" в документації Django) — під ASGI
+# (config/asgi.py вмикає ASYNC_VIEWS) з'єднання закриваються після кожного запиту
+if ASYNC_VIEWS:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -117,9 +163,40 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Спільний для всіх воркерів стан (tracks/sharedcache.py): версії каталогу й жанрів,
+# кеш сторінок з його lock-ами, буфер лічильників. Окремий SQLite-файл, як RATELIMIT_DB.
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", BASE_DIR / "shared_state.sqlite3")
+
 CACHES = {
+    # пам'ять процесу: фрагменти карток, результати пошуку, COUNT-и — усе з версією в ключі
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "beatstore-cache",
-    }
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    "shared": {
+        "BACKEND": "tracks.sharedcache.SQLiteCache",
+        "LOCATION": SHARED_STATE_DB,
+        "OPTIONS": {"MAX_ENTRIES": 2000},  # витісняються лише записи з таймаутом (сторінки)
+    },
 }
+
+# Write-behind лічильники переглядів / кліків (tracks/counters.py)
+COUNTER_FLUSH_INTERVAL = int(os.getenv("COUNTER_FLUSH_INTERVAL", 60))  # сек
+COUNTER_FLUSH_THRESHOLD = int(os.getenv("COUNTER_FLUSH_THRESHOLD", 100))  # подій
+COUNTER_FLUSH_THREAD = os.getenv("COUNTER_FLUSH_THREAD", "True") == "True"  # флаш у фоновому потоці, не в запиті
+
+# Кеш готових сторінок home / catalog / track_detail (tracks/pagecache.py)
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "True") == "True"
+
+# Rate limit (tracks/ratelimit.py): окремий SQLite-файл, спільний для всіх воркерів
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "True") == "True"
+RATELIMIT_DB = os.getenv("RATELIMIT_DB", BASE_DIR / "ratelimit.sqlite3")
+# адреси / мережі проксі (nginx тощо), яким віримо X-Forwarded-For; порожньо — лише REMOTE_ADDR
+RATELIMIT_TRUSTED_PROXIES = [p.strip() for p in os.getenv("RATELIMIT_TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+# Інструментація запитів (tracks/perf.py): Server-Timing, гістограми, лог повільних
+PERF_ENABLED = os.getenv("PERF_ENABLED", "True") == "True"
+PERF_SLOW_MS = int(os.getenv("PERF_SLOW_MS", 500))
+PERF_WINDOW_SECONDS = 300
+PERF_WINDOWS = 12  # гістограми за останню годину
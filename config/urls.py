@@ -1,17 +1,15 @@
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
 from django.urls import path, include
 from django.views.generic import TemplateView
-from tracks.sitemaps import TrackSitemap
-
-sitemaps = {
-    "tracks": TrackSitemap,
-}
+from tracks import perf, sitemaps
 
 urlpatterns = [
+    path("admin/perf.json", perf.stats_view, name="perf_stats"),  # до admin/, інакше його catch-all дасть 404
     path('admin/', admin.site.urls),
     path('', include('tracks.urls')),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="django.contrib.sitemaps.views.sitemap"),
+    path("sitemap.xml", sitemaps.sitemap_index, name="sitemap"),
+    path("sitemap-pages.xml", sitemaps.sitemap_pages, name="sitemap_pages"),
+    path("sitemap-tracks-<int:chunk>.xml", sitemaps.sitemap_tracks, name="sitemap_tracks"),
     path("robots.txt", TemplateView.as_view(
         template_name="robots.txt", content_type="text/plain"
     )),
@@ -1,11 +1,18 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 
-from .models import Track, Inquiry, Genre
+from . import search, stats
+from .models import Track, Inquiry, Genre, OutboxMessage, extract_youtube_id
 
 
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "track_count")
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
 
@@ -14,11 +21,45 @@ class GenreAdmin(admin.ModelAdmin):
 class TrackAdmin(admin.ModelAdmin):
     list_display = ("title", "is_featured", "view_count", "order_clicks", "created_at")
     list_filter = ("is_featured", "genres")
-    search_fields = ("title", "description", "youtube_url")
+    search_fields = ("title", "description", "youtube_url")  # лише щоб з'явилось поле пошуку — див. get_search_results
     ordering = ("-view_count", "-order_clicks", "-created_at")
     readonly_fields = ("view_count", "order_clicks")
     exclude = ("genres",)  # ← поле не показуємо
     # filter_horizontal = ("genres",)  # можна прибрати
+    STATS_DAYS = (7, 30, 90, 365)
+
+    def get_search_results(self, request, queryset, search_term):
+        # посилання на YouTube → точний пошук по video_id; решта — FTS-індекс, а не LIKE '%x%'
+        video_id = extract_youtube_id(search_term.strip())
+        if video_id:
+            return queryset.filter(video_id=video_id), False
+        return search.filter_queryset(queryset, search_term), False
+
+    def get_urls(self):
+        return [
+            path("stats/", self.admin_site.admin_view(self.stats_view), name="tracks_track_stats"),
+        ] + super().get_urls()
+
+    def stats_view(self, request):
+        # лише TrackDailyStat — без сканування Inquiry, скільки б заявок не накопичилось
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = int(request.GET.get("days", 30))
+        except ValueError:
+            days = 30
+        if days not in self.STATS_DAYS:
+            days = 30
+        since = timezone.localdate() - timedelta(days=days - 1)
+        context = {
+            **self.admin_site.each_context(request),
+            **stats.report(since),
+            "opts": self.model._meta,
+            "title": "Статистика треків",
+            "days": days,
+            "day_choices": self.STATS_DAYS,
+        }
+        return TemplateResponse(request, "admin/tracks/track/stats.html", context)
 
 
 @admin.register(Inquiry)
@@ -26,3 +67,11 @@ class InquiryAdmin(admin.ModelAdmin):
     list_display = ("name", "license_type", "track", "created_at", "status")
     list_filter = ("license_type", "status", "created_at")
     search_fields = ("name", "contact", "message")
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("text", "last_error")
+    readonly_fields = ("created_at", "sent_at", "claim", "last_error")
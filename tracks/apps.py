@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TracksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracks'
+
+    def ready(self):
+        from . import perf, signals  # noqa: F401
+
+        perf.install()
@@ -0,0 +1,233 @@
+"""
+Масовий імпорт / експорт каталогу (manage.py import_tracks / export_tracks).
+
+Рядки читаються потоково і пишуться пачками: на пачку — кілька запитів
+(пошук існуючих, slug-и, жанри, bulk_create/bulk_update), а не N save()
+з сигналами.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from .genres import bump_genre_version
+from .models import Genre, Track, _extract_genre_names, extract_youtube_id, next_free_slug, recount_genre_tracks
+from .pagecache import bump_catalog_version
+from .related import refresh_for as refresh_related
+from .search import index_tracks
+
+EXPORT_FIELDS = ["title", "youtube_url", "description", "is_featured", "slug", "created_at"]
+SLUG_PREFIX_CHUNK = 100  # стільки LIKE в одному OR — щоб не впертись у ліміт глибини виразу SQLite
+
+TRUE_VALUES = {"1", "true", "yes", "y", "on", "так"}
+
+
+@dataclass
+class ImportStats:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.unchanged + self.skipped
+
+
+def read_rows(stream, fmt):
+    """Потоковий генератор dict-ів з JSONL або CSV."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"_error": f"рядок {line_no}: {e}"}
+
+
+def write_rows(stream, fmt, rows):
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def export_rows(chunk_size=2000):
+    qs = Track.objects.order_by("pk").values_list(*EXPORT_FIELDS)
+    for values in qs.iterator(chunk_size=chunk_size):
+        row = dict(zip(EXPORT_FIELDS, values))
+        row["created_at"] = row["created_at"].isoformat()
+        yield row
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def _clean(raw):
+    if raw.get("_error"):
+        raise ValueError(raw["_error"])
+    title = (raw.get("title") or "").strip()
+    url = (raw.get("youtube_url") or "").strip()
+    if not title or not url:
+        raise ValueError(f"потрібні title і youtube_url: {raw!r:.120}")
+    video_id = extract_youtube_id(url)
+    if not video_id:
+        raise ValueError(f"не YouTube-посилання: {url}")
+    created_at = raw.get("created_at")
+    return {
+        "title": title[:200],
+        "youtube_url": url,
+        "video_id": video_id,
+        "description": raw.get("description") or "",
+        "is_featured": _parse_bool(raw.get("is_featured")),
+        "slug": slugify(raw.get("slug") or "")[:220],
+        "created_at": parse_datetime(created_at) if created_at else None,
+    }
+
+
+def _taken_slugs(bases):
+    taken = set()
+    bases = sorted(bases)
+    for i in range(0, len(bases), SLUG_PREFIX_CHUNK):
+        q = Q()
+        for base in bases[i:i + SLUG_PREFIX_CHUNK]:
+            q |= Q(slug=base) | Q(slug__startswith=f"{base}-")  # не «alpha» для бази «a»
+        taken.update(Track.objects.filter(q).values_list("slug", flat=True))
+    return taken
+
+
+def _sync_genres_bulk(tracks):
+    """Жанри для цілої пачки: один slug__in, bulk_create відсутніх, diff по through-таблиці."""
+    wanted_keys = {t.pk: [key for _, key in _extract_genre_names(t.description)] for t in tracks}
+    display = {}
+    for t in tracks:
+        for name, key in _extract_genre_names(t.description):
+            display.setdefault(key, name)
+
+    genres = {g.slug: g.pk for g in Genre.objects.filter(slug__in=display)} if display else {}
+    missing = [Genre(name=display[key], slug=key) for key in display if key not in genres]
+    if missing:
+        Genre.objects.bulk_create(missing, ignore_conflicts=True)
+        genres.update(Genre.objects.filter(slug__in=[g.slug for g in missing]).values_list("slug", "pk"))
+
+    Through = Track.genres.through
+    current = {}
+    for track_id, genre_id in Through.objects.filter(track_id__in=wanted_keys).values_list("track_id", "genre_id"):
+        current.setdefault(track_id, set()).add(genre_id)
+
+    to_add, to_remove = [], Q()
+    for track_id, keys in wanted_keys.items():
+        wanted = {genres[k] for k in keys if k in genres}
+        have = current.get(track_id, set())
+        to_add += [Through(track_id=track_id, genre_id=g) for g in wanted - have]
+        if have - wanted:
+            to_remove |= Q(track_id=track_id, genre_id__in=have - wanted)
+    affected = set()
+    if to_remove:
+        removed = Through.objects.filter(to_remove)
+        affected.update(removed.values_list("genre_id", flat=True))
+        removed.delete()
+    if to_add:
+        Through.objects.bulk_create(to_add, ignore_conflicts=True)
+        affected.update(t.genre_id for t in to_add)
+    if affected:
+        # bulk_create/delete по through не шлють m2m_changed
+        recount_genre_tracks(affected)
+        bump_genre_version()
+
+
+def import_batch(raw_rows, stats: ImportStats, upsert=True):
+    rows = {}
+    for raw in raw_rows:
+        try:
+            row = _clean(raw)
+        except ValueError as e:
+            stats.skipped += 1
+            stats.errors.append(str(e))
+            continue
+        if row["youtube_url"] in rows:
+            stats.skipped += 1  # дубль у межах пачки — перемагає останній
+        rows[row["youtube_url"]] = row
+    if not rows:
+        return []
+
+    video_ids = [r["video_id"] for r in rows.values()]
+    existing = Track.objects.filter(Q(youtube_url__in=rows) | Q(video_id__in=video_ids)).only(
+        "pk", "title", "youtube_url", "video_id", "description", "is_featured", "slug"
+    )
+    by_url = {t.youtube_url: t for t in existing}
+    by_video = {t.video_id: t for t in by_url.values()}
+
+    new_rows, changed = [], []
+    now = timezone.now()  # bulk_update не викликає auto_now
+    new_videos = set()
+    for url, row in rows.items():
+        track = by_url.get(url)
+        if track is None and (row["video_id"] in by_video or row["video_id"] in new_videos):
+            stats.skipped += 1
+            stats.errors.append(f"відео {row['video_id']} вже є під іншим URL: {url}")
+            continue
+        if track is None:
+            new_rows.append(row)
+            new_videos.add(row["video_id"])
+            continue
+        if not upsert:
+            stats.skipped += 1
+            continue
+        fields = ("title", "description", "is_featured")
+        if all(getattr(track, f) == row[f] for f in fields):
+            stats.unchanged += 1
+            continue
+        for f in fields:
+            setattr(track, f, row[f])
+        track.updated_at = now
+        changed.append(track)
+
+    # slug-и для всієї пачки: один запит на кожні SLUG_PREFIX_CHUNK баз
+    bases = [row["slug"] or slugify(row["title"])[:200] or "track" for row in new_rows]
+    taken = _taken_slugs(set(bases)) if bases else set()
+    created = []
+    for row, base in zip(new_rows, bases):
+        # один спільний taken: бази перетинаються («beat» видає «beat-2», яке є й базою)
+        slug = next_free_slug(base, taken)
+        taken.add(slug)
+        created.append(Track(
+            title=row["title"], youtube_url=row["youtube_url"], video_id=row["video_id"],
+            description=row["description"], is_featured=row["is_featured"], slug=slug,
+        ))
+    if created:
+        Track.objects.bulk_create(created)
+        dated = []
+        for track, row in zip(created, new_rows):
+            if row["created_at"]:
+                track.created_at = row["created_at"]
+                dated.append(track)
+        if dated:
+            Track.objects.bulk_update(dated, ["created_at"])
+    if changed:
+        Track.objects.bulk_update(changed, ["title", "description", "is_featured", "updated_at"])
+
+    stats.created += len(created)
+    stats.updated += len(changed)
+    touched = created + changed
+    if touched:
+        _sync_genres_bulk(touched)
+        refresh_related([t.pk for t in touched])
+        index_tracks([t.pk for t in touched])
+        bump_catalog_version()  # bulk-операції не шлють сигналів
+    return touched
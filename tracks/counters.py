@@ -0,0 +1,176 @@
+"""
+Write-behind лічильники для Track.view_count / Track.order_clicks.
+
+Інкременти копляться в таблиці-буфері спільного SQLite-файлу (SHARED_STATE_DB,
+tracks/sharedcache.py) — рядок на (трек, поле), тобто лише «брудні» треки; її
+бачать усі воркери і manage.py flush_counters, і нічого з неї не витісняється.
+Подія — одна транзакція у цьому файлі: інкремент у буфері й лічильник
+pending у counter_meta разом.
+
+У БД ідуть пачкою: раз на COUNTER_FLUSH_INTERVAL секунд або коли набралось
+COUNTER_FLUSH_THRESHOLD подій — одна транзакція на всі брудні треки.
+Ті ж дельти в тій же транзакції йдуть у денну статистику (tracks/stats.py).
+Флаш робить фоновий потік процесу (як відправку в Telegram у tracks/notify.py),
+а не запит, що перетнув поріг; без потоку (COUNTER_FLUSH_THREAD=False) — сам
+запит, або cron з `manage.py flush_counters`.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils.connection import ConnectionProxy
+
+from .sharedcache import connect, immediate
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("view_count", "order_clicks")
+
+LOCK_KEY = "counters:flush_lock"
+LOCK_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counter_buffer (
+    track_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (track_id, field)
+) WITHOUT ROWID;
+-- pending — скільки подій ще не злито в БД, last_flush — коли почався останній флаш
+CREATE TABLE IF NOT EXISTS counter_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    pending INTEGER NOT NULL,
+    last_flush REAL NOT NULL
+);
+INSERT OR IGNORE INTO counter_meta (id, pending, last_flush) VALUES (1, 0, CAST(strftime('%s', 'now') AS REAL));
+"""
+
+shared = ConnectionProxy(caches, "shared")
+
+
+def _buffer():
+    return connect(settings.SHARED_STATE_DB, SCHEMA)
+
+
+def _interval():
+    return getattr(settings, "COUNTER_FLUSH_INTERVAL", 60)
+
+
+def _threshold():
+    return getattr(settings, "COUNTER_FLUSH_THRESHOLD", 100)
+
+
+def record(track_id, field):
+    if field not in FIELDS:
+        raise ValueError(f"Unknown counter: {field}")
+    with immediate(_buffer()) as conn:
+        conn.execute(
+            "INSERT INTO counter_buffer (track_id, field, n) VALUES (?, ?, 1) "
+            "ON CONFLICT (track_id, field) DO UPDATE SET n = n + 1",
+            (track_id, field),
+        )
+        conn.execute("UPDATE counter_meta SET pending = pending + 1")
+        pending, last = conn.execute("SELECT pending, last_flush FROM counter_meta").fetchone()
+
+    if pending >= _threshold() or time.time() - last >= _interval():
+        if getattr(settings, "COUNTER_FLUSH_THREAD", True):
+            flusher.wake()
+        else:
+            flush()
+
+
+def record_view(track_id):
+    record(track_id, "view_count")
+
+
+def record_order_click(track_id):
+    record(track_id, "order_clicks")
+
+
+def pending_for(track_id):
+    """Ще не злиті в БД інкременти: {field: n}."""
+    rows = dict(_buffer().execute("SELECT field, n FROM counter_buffer WHERE track_id = ?", (track_id,)))
+    return {f: rows.get(f, 0) for f in FIELDS}
+
+
+def flush():
+    """
+    Зливає накопичені інкременти в БД однією транзакцією — лише брудні треки.
+    Повертає кількість оновлених треків (0, якщо флаш уже йде в іншому воркері).
+    """
+    from . import stats
+    from .models import Track
+
+    if not shared.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        return 0
+    try:
+        buffer = _buffer()
+        with immediate(buffer):
+            # last_flush — одразу, щоб інші воркери не будили флаш ще раз, поки цей іде
+            buffer.execute("UPDATE counter_meta SET last_flush = ?", (time.time(),))
+            rows = buffer.execute("SELECT track_id, field, n FROM counter_buffer").fetchall()
+        deltas = {}
+        for pk, field, n in rows:
+            deltas.setdefault(pk, {})[field] = n
+        # видалені треки — просто викидаємо їхні інкременти
+        deltas = {pk: deltas[pk] for pk in Track.objects.filter(pk__in=deltas).values_list("pk", flat=True)}
+
+        if deltas:
+            with transaction.atomic():
+                for pk, fields in deltas.items():
+                    Track.objects.filter(pk=pk).update(
+                        **{field: F(field) + n for field, n in fields.items()}
+                    )
+                stats.record_counts(deltas)
+        # віднімаємо злите, а не видаляємо — щоб не загубити інкременти, що прилетіли під час флашу
+        with immediate(buffer):
+            buffer.executemany(
+                "UPDATE counter_buffer SET n = n - ? WHERE track_id = ? AND field = ?",
+                [(n, pk, field) for pk, field, n in rows],
+            )
+            buffer.execute("DELETE FROM counter_buffer WHERE n <= 0")
+            buffer.execute(
+                "UPDATE counter_meta SET pending = max(pending - ?, 0)", (sum(n for _, _, n in rows),)
+            )
+        return len(deltas)
+    finally:
+        shared.delete(LOCK_KEY)
+
+
+class _BackgroundFlusher:
+    """Фоновий потік у процесі вебсервера: зливає буфер, поки його будять, і виходить."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self._event.set()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self._event.clear()
+                flush()
+                with self._lock:
+                    if not self._event.is_set():
+                        self._thread = None
+                        return
+        except Exception:
+            logger.exception("Counter flush thread crashed")
+            with self._lock:
+                self._thread = None
+        finally:
+            connections.close_all()  # з'єднання цього потоку
+
+
+flusher = _BackgroundFlusher()
@@ -0,0 +1,79 @@
+"""
+Фасети жанрів для каталогу: genre_id → бітсет треків (int, біт № pk треку).
+
+Індекс — у пам'яті процесу, як реєстр жанрів (tracks/genres.py), але прив'язаний
+до версії каталогу зі спільного кешу: її піднімають і зміни треків, і m2m жанрів,
+в будь-якому воркері чи manage.py-команді, тож після кожної правки індекс
+перечитується одним запитом до through-таблиці. Далі
+лічильники для всіх чіпсів — це перетини / об'єднання бітсетів і bit_count(),
+без жодного запиту.
+"""
+import threading
+from functools import reduce
+from operator import and_, or_
+
+from .models import Track
+from .pagecache import catalog_version
+
+MODES = ("and", "or")  # ?mode=: треки з усіма обраними жанрами / з будь-яким
+
+
+def bitset(pks) -> int:
+    """Бітсет з набору pk (через bytearray — без квадратичного |= на довгих int)."""
+    pks = list(pks)
+    if not pks:
+        return 0
+    buf = bytearray(max(pks) // 8 + 1)
+    for pk in pks:
+        buf[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(buf, "little")
+
+
+def contains(bits: int, pk: int) -> bool:
+    return bool(bits >> pk & 1)
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._bits = None
+
+    def bits(self) -> dict:
+        version = catalog_version()
+        if self._bits is None or self._version != version:
+            with self._lock:
+                if self._bits is None or self._version != version:
+                    pks = {}
+                    rows = Track.genres.through.objects.values_list("genre_id", "track_id")
+                    for genre_id, track_id in rows.iterator(chunk_size=5000):
+                        pks.setdefault(genre_id, []).append(track_id)
+                    self._bits = {genre_id: bitset(ids) for genre_id, ids in pks.items()}
+                    self._version = version
+        return self._bits
+
+    def select(self, genre_ids, mode="and"):
+        """Бітсет треків під фільтром жанрів; None — фільтра немає (усі треки)."""
+        if not genre_ids:
+            return None
+        bits = self.bits()
+        return reduce(and_ if mode == "and" else or_, (bits.get(g, 0) for g in genre_ids))
+
+    def counts(self, genre_ids, mode="and", within=None) -> dict:
+        """
+        {genre_id: скільки треків буде у видачі, якщо цей жанр теж обрати} — для
+        кожного жанру. Для вже обраних це поточна кількість. within — бітсет,
+        яким додатково обмежена видача (результати пошуку).
+        """
+        current = self.select(genre_ids, mode)
+        counts = {}
+        for genre_id, bits in self.bits().items():
+            if current is not None:
+                bits = current & bits if mode == "and" else current | bits
+            if within is not None:
+                bits &= within
+            counts[genre_id] = bits.bit_count()
+        return counts
+
+
+index = FacetIndex()
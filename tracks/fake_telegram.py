@@ -0,0 +1,68 @@
+"""
+Локальна заглушка Telegram Bot API для офлайн-тестів і розробки.
+
+    python manage.py fake_telegram --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, fail_first=0, on_message=None):
+        super().__init__((host, port), _Handler)
+        self.messages = []  # payload-и всіх успішних sendMessage
+        self.fail_first = fail_first  # скільки перших запитів відповісти 500
+        self.on_message = on_message
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._reply(400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid JSON"})
+
+        if not self.path.endswith("/sendMessage"):
+            return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+        with server._lock:
+            if server.fail_first > 0:
+                server.fail_first -= 1
+                return self._reply(500, {"ok": False, "error_code": 500, "description": "Internal Server Error"})
+            server.messages.append(payload)
+            message_id = len(server.messages)
+
+        if server.on_message:
+            server.on_message(payload)
+        self._reply(200, {"ok": True, "result": {"message_id": message_id, "text": payload.get("text", "")}})
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
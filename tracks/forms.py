@@ -1,11 +1,31 @@
 import re
+import time
 
 from django import forms
+from django.core import signing
 
 from .models import Inquiry
 
 COMMON_INPUT = "w-full px-3 py-2 rounded-lg bg-neutral-900 border border-neutral-800"
 
+# anti-bot: підписана мітка часу в прихованому полі замість session["order_started_at"]
+STARTED_SALT = "tracks.order.started"
+MIN_FILL_SECONDS = 3  # швидше людина форму не заповнить
+STARTED_MAX_AGE = 6 * 60 * 60  # стару сторінку просимо оновити
+
+
+def make_started_token(now=None):
+    return signing.TimestampSigner(salt=STARTED_SALT).sign(str(int(time.time() if now is None else now)))
+
+
+def started_token_age(token):
+    """Скільки секунд тому видано токен; None — підроблений або протухлий."""
+    try:
+        started = int(signing.TimestampSigner(salt=STARTED_SALT).unsign(token, max_age=STARTED_MAX_AGE))
+    except (signing.BadSignature, ValueError):
+        return None
+    return time.time() - started
+
 
 class InquiryForm(forms.ModelForm):
     honeypot = forms.CharField(required=False, widget=forms.HiddenInput)
@@ -25,6 +45,17 @@ class InquiryForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         for field in ["name", "contact", "license_type", "message"]:
             self.fields[field].widget.attrs["class"] = COMMON_INPUT
+        # завжди свіжий: після помилки валідації форма знову має бути придатна
+        self.started_token = make_started_token()
+
+    def clean(self):
+        cleaned = super().clean()
+        age = started_token_age(self.data.get("started", ""))
+        if age is None:
+            raise forms.ValidationError("Форма застаріла — онови сторінку і спробуй ще раз.")
+        if age < MIN_FILL_SECONDS:
+            raise forms.ValidationError("Здається, бот. Заповнюй форму не так блискавично :)")
+        return cleaned
 
     def clean_contact(self):
         v = self.cleaned_data["contact"].strip()
@@ -0,0 +1,95 @@
+"""
+Процесний реєстр жанрів: slug → Genre, розбивка primary/other і топ-N.
+
+Перечитується з БД лише коли змінилась «версія жанрів» у спільному кеші
+(caches["shared"]: її піднімають сигнали в tracks/signals.py і імпорт у будь-якому
+воркері чи manage.py-команді), тож у стабільному стані
+чіпси і пошук ?genre= не коштують жодного запиту.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+from .models import Genre
+
+VERSION_KEY = "genres:version"
+
+shared = ConnectionProxy(caches, "shared")
+
+PRIMARY_TOKENS = {"female", "male"}  # що вважати «основними» жанрами
+
+
+def is_primary_genre(g):
+    slug = (g.slug or "").strip().lower()
+    name = (g.name or "").strip().lower()
+    return slug in PRIMARY_TOKENS or name in PRIMARY_TOKENS
+
+
+def genre_version() -> int:
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        # стартуємо з часу, а не з 1: після очистки кешу версії не повторяться
+        shared.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = shared.get(VERSION_KEY, 0)
+    return version
+
+
+def _bump():
+    genre_version()
+    try:
+        shared.incr(VERSION_KEY)
+    except ValueError:  # ключ зник між get та incr
+        shared.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def bump_genre_version():
+    _bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_bump)  # щоб ніхто не закешував знімок до COMMIT під новою версією
+
+
+class _Snapshot:
+    def __init__(self, genres):
+        self.all = genres  # за name
+        self.by_slug = {g.slug: g for g in genres}
+        self.used = [g for g in genres if g.track_count > 0]
+        self.primary = [g for g in self.used if is_primary_genre(g)]
+        self.other = [g for g in self.used if not is_primary_genre(g)]
+        self.top = sorted(self.used, key=lambda g: (-g.track_count, g.name))
+
+
+class GenreRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = None
+
+    def snapshot(self) -> _Snapshot:
+        version = genre_version()
+        if self._snapshot is None or self._version != version:
+            with self._lock:
+                if self._snapshot is None or self._version != version:
+                    self._snapshot = _Snapshot(list(Genre.objects.order_by("name")))
+                    self._version = version
+        return self._snapshot
+
+    def get(self, slug):
+        return self.snapshot().by_slug.get(slug) if slug else None
+
+    def used(self):
+        return self.snapshot().used
+
+    def primary(self):
+        return self.snapshot().primary
+
+    def other(self):
+        return self.snapshot().other
+
+    def top(self, n):
+        return self.snapshot().top[:n]
+
+
+registry = GenreRegistry()
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tracks.stats import compact
+
+
+class Command(BaseCommand):
+    help = "Згортає старі денні рядки TrackDailyStat у місячні (для cron, раз на добу)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=90, help="скільки останніх днів лишати по днях")
+
+    def handle(self, *args, keep_days, **options):
+        # лише цілі місяці: інакше місяць у звіті був би наполовину денний, наполовину місячний
+        before = (timezone.localdate() - timedelta(days=keep_days)).replace(day=1)
+        removed = compact(before)
+        self.stdout.write(self.style.SUCCESS(f"Згорнуто денних рядків: {removed} (до {before})"))
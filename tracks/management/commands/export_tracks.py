@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from tracks.catalog_io import export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = "Потоковий експорт каталогу в JSONL/CSV (формат сумісний з import_tracks)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="файл .jsonl/.csv або - для stdout")
+        parser.add_argument("--format", choices=["jsonl", "csv"])
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, path, format, chunk_size, **options):
+        fmt = format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        rows = export_rows(chunk_size=chunk_size)
+        if path == "-":
+            write_rows(self.stdout, fmt, rows)
+            return
+        with Path(path).open("w", encoding="utf-8", newline="") as f:
+            write_rows(f, fmt, rows)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from tracks.fake_telegram import FakeTelegramServer
+
+
+class Command(BaseCommand):
+    help = "Запускає локальну заглушку Telegram Bot API (друкує всі sendMessage)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--fail-first", type=int, default=0, help="перші N запитів відповідати 500")
+
+    def handle(self, *args, **options):
+        def on_message(payload):
+            self.stdout.write(f"--- sendMessage → chat {payload.get('chat_id')}\n{payload.get('text')}\n")
+
+        server = FakeTelegramServer(options["host"], options["port"], options["fail_first"], on_message)
+        self.stdout.write(self.style.SUCCESS(f"Fake Telegram: {server.url}  (TELEGRAM_API_URL={server.url})"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tracks import counters
+
+
+class Command(BaseCommand):
+    help = "Примусово зливає буферизовані view_count / order_clicks у БД"
+
+    def handle(self, *args, **options):
+        updated = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f"Оновлено треків: {updated}"))
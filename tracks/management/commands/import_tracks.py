@@ -0,0 +1,57 @@
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tracks.catalog_io import ImportStats, import_batch, read_rows
+
+
+class Command(BaseCommand):
+    help = "Потоковий імпорт треків з JSONL/CSV пачками через bulk_create (upsert по youtube_url)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="файл .jsonl/.csv або - для stdin")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="за замовчуванням — з розширення")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--no-upsert", action="store_true", help="існуючі youtube_url пропускати, а не оновлювати")
+        parser.add_argument("--dry-run", action="store_true", help="все порахувати і відкотити")
+
+    def handle(self, *args, path, format, batch_size, no_upsert, dry_run, **options):
+        fmt = format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        if path == "-":
+            stream = sys.stdin
+        else:
+            try:
+                stream = Path(path).open(encoding="utf-8", newline="")
+            except OSError as e:
+                raise CommandError(e)
+
+        stats = ImportStats()
+        started = time.monotonic()
+        rows = read_rows(stream, fmt)
+        try:
+            # dry-run: одна транзакція на все і rollback; інакше — транзакція на пачку
+            with transaction.atomic() if dry_run else nullcontext():
+                while batch := list(islice(rows, batch_size)):
+                    with transaction.atomic():
+                        import_batch(batch, stats, upsert=not no_upsert)
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f"{stats.rows} рядків, {stats.rows / elapsed:.0f} рядків/с")
+                if dry_run:
+                    transaction.set_rollback(True)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in stats.errors[:20]:
+            self.stderr.write(f"  пропущено: {error}")
+        elapsed = time.monotonic() - started
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}створено {stats.created}, оновлено {stats.updated}, без змін {stats.unchanged}, "
+            f"пропущено {stats.skipped} за {elapsed:.1f} с ({stats.rows / max(elapsed, 1e-9):.0f} рядків/с)"
+        ))
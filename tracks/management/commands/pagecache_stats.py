@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tracks import pagecache
+
+
+class Command(BaseCommand):
+    help = "Статистика кешу сторінок: hits / stale / misses / bypass і hit ratio"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="обнулити лічильники")
+
+    def handle(self, *args, reset, **options):
+        data = pagecache.stats()
+        for name in pagecache.STATS_KEYS:
+            self.stdout.write(f"{name:>8}: {data[name]}")
+        self.stdout.write(f"hit ratio: {data['hit_ratio']:.1%}  (версія каталогу {data['version']})")
+        if reset:
+            pagecache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Лічильники обнулено"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracks import notify
+
+
+class Command(BaseCommand):
+    help = "Воркер outbox: відправляє сповіщення в Telegram з повторами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="один прохід і вихід")
+        parser.add_argument("--idle", type=float, default=5.0, help="пауза, коли черга порожня (сек)")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = notify.deliver_pending()
+            if sent:
+                self.stdout.write(f"Відправлено: {sent}")
+            if options["once"]:
+                return
+            wait = notify.next_due_in()
+            time.sleep(options["idle"] if wait is None else min(max(wait, 0.5), options["idle"]))
@@ -0,0 +1,76 @@
+import re
+from urllib.parse import parse_qs, urlparse
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# копія tracks.models.extract_youtube_id на момент міграції: подальші зміни парсера
+# не мають міняти те, що робить уже застосована міграція
+YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+YOUTUBE_PATH_PREFIXES = {"shorts", "embed", "live", "v"}
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def extract_youtube_id(url):
+    try:
+        u = urlparse((url or "").strip())
+    except ValueError:
+        return None
+    host = (u.hostname or "").removeprefix("www.")
+    parts = [p for p in u.path.split("/") if p]
+    if host == "youtu.be":
+        video_id = parts[0] if parts else None
+    elif host in YOUTUBE_HOSTS:
+        if len(parts) >= 2 and parts[0] in YOUTUBE_PATH_PREFIXES:
+            video_id = parts[1]
+        else:
+            video_id = parse_qs(u.query).get("v", [None])[0]
+    else:
+        return None
+    if video_id and VIDEO_ID_RE.match(video_id):
+        return video_id
+    return None
+
+
+def backfill_video_id(apps, schema_editor):
+    Track = apps.get_model("tracks", "Track")
+    seen = set()
+    last_pk = 0
+    while True:
+        batch = list(
+            Track.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "youtube_url")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for track in batch:
+            video_id = extract_youtube_id(track.youtube_url)
+            # дублікати лишаємо з NULL, щоб не впасти на unique нижче
+            track.video_id = video_id if video_id not in seen else None
+            if video_id:
+                seen.add(video_id)
+        Track.objects.bulk_update(batch, ["video_id"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0006_track_order_clicks_track_view_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='video_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=11, null=True),
+        ),
+        migrations.RunPython(backfill_video_id, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='track',
+            name='video_id',
+            field=models.CharField(blank=True, editable=False, max_length=11, null=True, unique=True),
+        ),
+    ]
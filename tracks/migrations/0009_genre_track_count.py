@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_track_count(apps, schema_editor):
+    Genre = apps.get_model("tracks", "Genre")
+    Through = apps.get_model("tracks", "Track").genres.through
+    counts = (
+        Through.objects.filter(genre_id=OuterRef("pk"))
+        .order_by()
+        .values("genre_id")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Genre.objects.update(track_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0008_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='track_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_track_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:24
+
+import heapq
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# копія скорингу з tracks/related.py на момент міграції: подальші зміни алгоритму
+# не мають міняти те, що робить уже застосована міграція
+TOP_K = 12
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_DAYS = 90
+CANDIDATES_PER_GENRE = 300
+WRITE_BATCH = 2000
+
+
+def score(genres_a, genres_b, created_b, now):
+    union = len(genres_a | genres_b)
+    if not union:
+        return 0.0
+    jaccard = len(genres_a & genres_b) / union
+    if not jaccard:
+        return 0.0
+    age_days = max((now - created_b).total_seconds() / 86400, 0)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    return (1 - RECENCY_WEIGHT) * jaccard + RECENCY_WEIGHT * recency
+
+
+def build_related(apps, schema_editor):
+    Track = apps.get_model("tracks", "Track")
+    RelatedTrack = apps.get_model("tracks", "RelatedTrack")
+
+    genre_sets = defaultdict(set)
+    rows = Track.genres.through.objects.values_list("track_id", "genre_id")
+    for track_id, genre_id in rows.iterator(chunk_size=5000):
+        genre_sets[track_id].add(genre_id)
+    created = dict(Track.objects.values_list("pk", "created_at").iterator(chunk_size=5000))
+
+    index = defaultdict(list)  # genre_id → до CANDIDATES_PER_GENRE найсвіжіших треків
+    for track_id, genres in genre_sets.items():
+        for genre_id in genres:
+            index[genre_id].append(track_id)
+    for ids in index.values():
+        ids.sort(key=lambda pk: created[pk], reverse=True)
+        del ids[CANDIDATES_PER_GENRE:]
+
+    now = timezone.now()
+    batch = []
+    for track_id, genres in genre_sets.items():
+        candidates = {pk for g in genres for pk in index[g]}
+        candidates.discard(track_id)
+        scored = ((score(genres, genre_sets[pk], created[pk], now), pk) for pk in candidates)
+        batch += [
+            RelatedTrack(track_id=track_id, related_id=pk, score=s)
+            for s, pk in heapq.nlargest(TOP_K, scored)
+            if s > 0
+        ]
+        if len(batch) >= WRITE_BATCH:
+            RelatedTrack.objects.bulk_create(batch)
+            batch = []
+    RelatedTrack.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0009_genre_track_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracks.track')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='tracks.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['track', '-score'], name='related_track_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('track', 'related'), name='uniq_related_track')],
+            },
+        ),
+        migrations.RunPython(build_related, migrations.RunPython.noop),
+    ]
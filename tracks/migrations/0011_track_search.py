@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# FTS5 є лише в SQLite; на інших базах пошук падає назад на icontains (tracks/search.py)
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_track_search USING fts5(
+    title, genres, description, tags,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE)
+    schema_editor.execute("""
+        INSERT INTO tracks_track_search (rowid, title, genres, description, tags)
+        SELECT t.id, t.title,
+               COALESCE((SELECT group_concat(g.name, ' ')
+                         FROM tracks_track_genres tg JOIN tracks_genre g ON g.id = tg.genre_id
+                         WHERE tg.track_id = t.id), ''),
+               t.description,
+               COALESCE((SELECT group_concat('g' || tg.genre_id, ' ')
+                         FROM tracks_track_genres tg WHERE tg.track_id = t.id), '')
+        FROM tracks_track t
+    """)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS tracks_track_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0010_relatedtrack'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
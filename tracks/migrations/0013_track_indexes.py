@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0012_track_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['-is_featured', '-created_at', 'id'], name='track_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['-created_at', '-id'], name='track_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['-view_count', '-order_clicks', '-created_at', '-id'], name='track_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0013_track_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('period', models.CharField(choices=[('d', 'День'), ('m', 'Місяць')], default='d', max_length=1)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('order_clicks', models.PositiveIntegerField(default=0)),
+                ('inquiries_nonexclusive', models.PositiveIntegerField(default=0)),
+                ('inquiries_exclusive', models.PositiveIntegerField(default=0)),
+                ('inquiries_exclusive_stems', models.PositiveIntegerField(default=0)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tracks.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'period'], name='track_stat_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('track', 'day', 'period'), name='uniq_track_daily_stat')],
+            },
+        ),
+    ]
@@ -1,8 +1,13 @@
+import re
 from urllib.parse import urlparse, parse_qs
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 
 LICENSE_CHOICES = [
@@ -12,27 +17,86 @@ LICENSE_CHOICES = [
     ("custom", "Custom"),
 ]
 
-def _youtube_embed_from_url(url: str) -> str | None:
+YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+YOUTUBE_PATH_PREFIXES = {"shorts", "embed", "live", "v"}
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def extract_youtube_id(url: str) -> str | None:
+    """
+    Витягує ID відео з YouTube-посилання:
+    youtu.be/<id>, watch?v=<id>&t=.., /shorts/<id>, /embed/<id>, /live/<id>.
+    """
     try:
-        u = urlparse(url)
-        host = u.netloc.replace('www.', '')
-        if host == 'youtu.be':
-            video_id = u.path.lstrip('/')
-        elif host in ('youtube.com', 'm.youtube.com', 'music.youtube.com'):
-            qs = parse_qs(u.query)
-            video_id = qs.get('v', [None])[0]
+        u = urlparse((url or "").strip())
+    except ValueError:
+        return None
+    host = (u.hostname or "").removeprefix("www.")
+    parts = [p for p in u.path.split("/") if p]
+    if host == "youtu.be":
+        video_id = parts[0] if parts else None
+    elif host in YOUTUBE_HOSTS:
+        if len(parts) >= 2 and parts[0] in YOUTUBE_PATH_PREFIXES:
+            video_id = parts[1]
         else:
-            return None
-        if not video_id:
-            return None
-        return f"https://www.youtube.com/embed/{video_id}"
-    except Exception:
+            video_id = parse_qs(u.query).get("v", [None])[0]
+    else:
         return None
+    if video_id and VIDEO_ID_RE.match(video_id):
+        return video_id
+    return None
+
+
+SLUG_SAVE_ATTEMPTS = 5
+
+
+def next_free_slug(base: str, taken) -> str:
+    """base, якщо вільний; інакше base-N, де N — наступний після найбільшого зайнятого."""
+    pattern = re.compile(rf"^{re.escape(base)}(?:-(\d+))?$")
+    base_taken = False
+    max_n = 1
+    for slug in taken:
+        m = pattern.match(slug)
+        if not m:
+            continue
+        if m[1] is None:
+            base_taken = True
+        else:
+            max_n = max(max_n, int(m[1]))
+    return f"{base}-{max_n + 1}" if base_taken else base
+
+
+def unique_slug(model, base: str, exclude_pk=None) -> str:
+    """Вільний slug одним запитом: читаємо всі base / base-N і беремо наступний суфікс."""
+    taken = model.objects.filter(Q(slug=base) | Q(slug__startswith=f"{base}-"))
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    return next_free_slug(base, taken.values_list("slug", flat=True))
+
+
+def save_with_unique_slug(instance, base: str, save, *args, **kwargs):
+    """
+    Зберігає з автоматичним slug. Якщо паралельний save встиг зайняти той самий
+    slug (IntegrityError на unique), перераховуємо і пробуємо ще раз.
+    """
+    model = type(instance)
+    for attempt in range(SLUG_SAVE_ATTEMPTS):
+        instance.slug = unique_slug(model, base, instance.pk)
+        try:
+            with transaction.atomic():
+                save(*args, **kwargs)
+            return
+        except IntegrityError:
+            clash = model.objects.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if not clash or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                raise
 
 
 class Genre(models.Model):
     name = models.CharField(max_length=60, unique=True)
     slug = models.SlugField(max_length=80, unique=True, blank=True)
+    # денормалізовано: підтримується сигналами m2m_changed (tracks/signals.py)
+    track_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -41,21 +105,26 @@ class Genre(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        from django.utils.text import slugify
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+        base = slugify(self.name)[:70] or "genre"
+        save_with_unique_slug(self, base, super().save, *args, **kwargs)
 
 
 from django.db import models
 from django.utils.text import slugify
 
+# поля, які змінюють лише лічильники — такі збереження не міняють ні сторінок, ні updated_at
+COUNTER_FIELDS = {"view_count", "order_clicks"}
+
+
 class Track(models.Model):
     title = models.CharField(max_length=200)
     youtube_url = models.URLField()
     description = models.TextField(blank=True)
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # lastmod для sitemap; лічильники його не чіпають
     view_count = models.PositiveIntegerField(default=0)      # перегляди деталки
     order_clicks = models.PositiveIntegerField(default=0)    # кліки "Замовити"
 
@@ -64,37 +133,57 @@ class Track(models.Model):
 
     slug = models.SlugField(max_length=220, unique=True)
 
+    # ID відео з youtube_url — рахуємо один раз при збереженні, а не на кожен рендер
+    video_id = models.CharField(max_length=11, unique=True, null=True, blank=True, editable=False)
+
+    # опис, з якого востаннє синхронізували жанри (None — невідомо)
+    _synced_description = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._synced_description = instance.__dict__.get("description")
+        return instance
+
+    def clean(self):
+        super().clean()
+        video_id = extract_youtube_id(self.youtube_url)
+        dup = video_id and Track.objects.filter(video_id=video_id).exclude(pk=self.pk).first()
+        if dup:
+            raise ValidationError({"youtube_url": f"Це відео вже завантажене: «{dup.title}»."})
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.title)[:200] or "track"
-            s = base
-            i = 2
-            while Track.objects.filter(slug=s).exclude(pk=self.pk).exists():
-                s = f"{base}-{i}"
-                i += 1
-            self.slug = s
-        super().save(*args, **kwargs)
-
-    # ⬇️ ЦЕ ЛИШАЙ — як у тебе було
+        self.video_id = extract_youtube_id(self.youtube_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "youtube_url" in update_fields:
+            kwargs["update_fields"] = update_fields = {*update_fields, "video_id"}
+        if update_fields is not None and set(update_fields) - COUNTER_FIELDS:
+            kwargs["update_fields"] = {*update_fields, "updated_at"}
+        if self.slug:
+            return super().save(*args, **kwargs)
+        base = slugify(self.title)[:200] or "track"
+        save_with_unique_slug(self, base, super().save, *args, **kwargs)
+
     @property
     def embed_url(self):
-        from urllib.parse import urlparse, parse_qs
-        try:
-            u = urlparse(self.youtube_url)
-            host = u.netloc.replace('www.', '')
-            if host == 'youtu.be':
-                vid = u.path.lstrip('/')
-            elif host in ('youtube.com', 'm.youtube.com', 'music.youtube.com'):
-                vid = parse_qs(u.query).get('v', [None])[0]
-            else:
-                return None
-            return f"https://www.youtube.com/embed/{vid}" if vid else None
-        except Exception:
-            return None
+        # nocookie — плеєр не ставить кукі, поки не натиснули ▶
+        return f"https://www.youtube-nocookie.com/embed/{self.video_id}" if self.video_id else None
+
+    @property
+    def thumbnail_url(self):
+        return f"https://i.ytimg.com/vi/{self.video_id}/hqdefault.jpg" if self.video_id else None
 
     def __str__(self):
         return self.title
 
+    class Meta:
+        # під сортування гарячих запитів — щоб SQLite не сортував усю таблицю (tests: ExplainPlanTests)
+        indexes = [
+            models.Index(fields=["-is_featured", "-created_at", "id"], name="track_catalog_idx"),  # catalog, home
+            models.Index(fields=["-created_at", "-id"], name="track_created_idx"),  # track_list, home «нові»
+            models.Index(fields=["-view_count", "-order_clicks", "-created_at", "-id"], name="track_popular_idx"),  # адмінка (+ -pk від ChangeList)
+        ]
+
     # НОВЕ (зручно лінкуватись у шаблонах)
     def get_absolute_url(self):
         from django.urls import reverse
@@ -102,6 +191,22 @@ class Track(models.Model):
 
 
 
+
+class RelatedTrack(models.Model):
+    """Передпорахований топ схожих треків (tracks/related.py), щоб деталка читала його одним запитом."""
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="related_links")
+    related = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["track", "related"], name="uniq_related_track"),
+        ]
+        indexes = [models.Index(fields=["track", "-score"], name="related_track_score_idx")]
+
+    def __str__(self):
+        return f"{self.track_id} → {self.related_id} ({self.score:.3f})"
+
 class Inquiry(models.Model):
     LICENSE_CHOICES = [
         ("nonexclusive", "Неексклюзив — мінус + права, трек лишається на моєму каналі"),
@@ -122,6 +227,72 @@ class Inquiry(models.Model):
         return f"{base} [{self.track.title if self.track else 'без треку'}]"
 
 
+class OutboxMessage(models.Model):
+    """Черга сповіщень у Telegram: view лише пише сюди, відправляє tracks.notify."""
+    STATUS_CHOICES = [
+        ("pending", "В черзі"),
+        ("sent", "Відправлено"),
+        ("failed", "Не вдалося"),
+    ]
+
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)  # хто з відправників зараз її тримає
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"#{self.pk} [{self.status}] {self.text[:40]}"
+
+
+class TrackDailyStat(models.Model):
+    """
+    Денна статистика треку (tracks/stats.py): рядок на трек на день. Старі дні
+    compact_stats згортає в місячні рядки (period="m", day — перше число місяця).
+    """
+    PERIOD_CHOICES = [("d", "День"), ("m", "Місяць")]
+
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    period = models.CharField(max_length=1, choices=PERIOD_CHOICES, default="d")
+    views = models.PositiveIntegerField(default=0)
+    order_clicks = models.PositiveIntegerField(default=0)
+    # заявки за типом ліцензії (Inquiry.LICENSE_CHOICES)
+    inquiries_nonexclusive = models.PositiveIntegerField(default=0)
+    inquiries_exclusive = models.PositiveIntegerField(default=0)
+    inquiries_exclusive_stems = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # на ньому тримається ON CONFLICT в upsert
+            models.UniqueConstraint(fields=["track", "day", "period"], name="uniq_track_daily_stat"),
+        ]
+        indexes = [models.Index(fields=["day", "period"], name="track_stat_day_idx")]
+
+    def __str__(self):
+        return f"{self.track_id} {self.day} [{self.period}] {self.views}/{self.order_clicks}"
+
+
+def recount_genre_tracks(genre_ids=None):
+    """Перераховує Genre.track_count одним UPDATE (для всіх жанрів, якщо genre_ids=None)."""
+    Through = Track.genres.through
+    counts = (
+        Through.objects.filter(genre_id=OuterRef("pk"))
+        .order_by()
+        .values("genre_id")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    qs = Genre.objects.all() if genre_ids is None else Genre.objects.filter(pk__in=genre_ids)
+    return qs.update(track_count=Coalesce(Subquery(counts), 0))
+
+
 def _extract_genre_names(text: str):
     if not text:
         return []
@@ -141,19 +312,57 @@ def _extract_genre_names(text: str):
     return clean
 
 
-@receiver(post_save, sender=Track)
-def sync_genres_from_description(sender, instance: Track, **kwargs):
-    names = _extract_genre_names(instance.description or "")
-    if not names:
-        instance.genres.clear()
-        return
-    genres = []
-    from .models import Genre  # локальний імпорт, щоб уникнути циклу
+def sync_track_genres(track: Track):
+    """
+    Приводить track.genres у відповідність до тегів з опису.
+    Кількість запитів стала, скільки б тегів не було: один SELECT по slug__in,
+    bulk_create відсутніх, bulk_update перейменованих і лише diff по through-таблиці.
+    """
+    names = _extract_genre_names(track.description or "")
+    keys = [key for _, key in names]
+
+    genres = {g.slug: g for g in Genre.objects.filter(slug__in=keys)} if keys else {}
+    missing = [Genre(name=display, slug=key) for display, key in names if key not in genres]
+    if missing:
+        Genre.objects.bulk_create(missing, ignore_conflicts=True)
+        genres.update({g.slug: g for g in Genre.objects.filter(slug__in=[g.slug for g in missing])})
+
+    # якщо в БД було інше написання — оновимо name на нормальне
+    renamed = []
     for display, key in names:
-        g, _ = Genre.objects.get_or_create(slug=key, defaults={"name": display})
-        # якщо в БД було інше написання — оновимо name на нормальне
-        if g.name != display:
+        g = genres.get(key)
+        if g and g.name != display:
             g.name = display
-            g.save(update_fields=["name"])
-        genres.append(g)
-    instance.genres.set(genres)
+            renamed.append(g)
+    if renamed:
+        Genre.objects.bulk_update(renamed, ["name"])
+    if missing or renamed:
+        from .genres import bump_genre_version  # bulk-операції не шлють post_save
+        bump_genre_version()
+    if renamed:
+        from .search import index_genre
+        for g in renamed:
+            index_genre(g.pk)
+
+    wanted = {genres[key].pk for key in keys if key in genres}
+    current = set(
+        Track.genres.through.objects.filter(track_id=track.pk).values_list("genre_id", flat=True)
+    )
+    if current - wanted:
+        track.genres.remove(*(current - wanted))
+    if wanted - current:
+        track.genres.add(*(wanted - current))
+
+
+@receiver(post_save, sender=Track)
+def sync_genres_from_description(sender, instance: Track, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    # збереження лічильників тощо — опис не чіпали, жанри теж
+    if update_fields is not None and "description" not in update_fields:
+        return
+    previous = "" if created else instance._synced_description
+    if previous == instance.description:
+        return
+    sync_track_genres(instance)
+    instance._synced_description = instance.description
@@ -1,20 +1,207 @@
+"""
+Сповіщення в Telegram через outbox.
+
+View лише кладе текст в OutboxMessage (enqueue_telegram), а відправляє
+фоновий потік (стартує після commit) або воркер `manage.py send_notifications`.
+Кілька повідомлень, що накопичились, склеюються в одне; помилки —
+повтор з експоненційною затримкою, після TELEGRAM_MAX_ATTEMPTS — статус failed.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
 import requests
 from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import perf
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TEXT_LIMIT = 4096
+MERGE_SEPARATOR = "\n\n— — —\n\n"
+BATCH_SIZE = 50
+CLAIM_LEASE = timedelta(seconds=60)  # якщо відправник помер — через хвилину забере інший
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_configured() -> bool:
+    return bool(settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_CHAT_ID)
+
+
+def get_session() -> requests.Session:
+    """Один Session на процес — keep-alive і пул з'єднань до api.telegram.org."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            s.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            s.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            s.hooks["response"].append(perf.http_response_hook)  # час у Server-Timing запиту
+            _session = s
+        return _session
+
+
+def backoff(attempts: int) -> timedelta:
+    base = _setting("TELEGRAM_RETRY_BASE", 5)
+    cap = _setting("TELEGRAM_RETRY_MAX", 60 * 30)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+
+def enqueue_telegram(text: str) -> OutboxMessage | None:
+    """Ставить повідомлення в чергу; відправка — після commit, поза запитом."""
+    if not is_configured():
+        return None
+    msg = OutboxMessage.objects.create(text=text)
+    if _setting("TELEGRAM_SENDER_THREAD", True):
+        transaction.on_commit(sender.wake)
+    return msg
+
 
+def merge_texts(texts, limit=TELEGRAM_TEXT_LIMIT):
+    """Склеює тексти в мінімум повідомлень не довших за limit. Повертає [(indexes, text)]."""
+    chunks = []
+    idx, buf = [], ""
+    for i, text in enumerate(texts):
+        text = text[:limit]
+        candidate = f"{buf}{MERGE_SEPARATOR}{text}" if buf else text
+        if buf and len(candidate) > limit:
+            chunks.append((idx, buf))
+            idx, buf = [i], text
+        else:
+            idx.append(i)
+            buf = candidate
+    if buf:
+        chunks.append((idx, buf))
+    return chunks
 
-def notify_telegram(text: str) -> None:
+
+def _post(text: str):
     token = settings.TELEGRAM_BOT_TOKEN
-    chat_id = settings.TELEGRAM_CHAT_ID
-    if not token or not chat_id:
-        return
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    api = _setting("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
     payload = {
-        "chat_id": chat_id,
+        "chat_id": settings.TELEGRAM_CHAT_ID,
         "text": text,
         "parse_mode": "HTML",
         "disable_web_page_preview": True,
     }
-    try:
-        requests.post(url, json=payload, timeout=5)
-    except Exception as e:
-        print("Telegram notify error:", e)
+    return get_session().post(f"{api}/bot{token}/sendMessage", json=payload, timeout=5)
+
+
+def _claim_due(now):
+    due_ids = list(
+        OutboxMessage.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("created_at", "pk")
+        .values_list("pk", flat=True)[:BATCH_SIZE]
+    )
+    if not due_ids:
+        return []
+    token = uuid.uuid4().hex
+    OutboxMessage.objects.filter(
+        pk__in=due_ids, status="pending", next_attempt_at__lte=now
+    ).update(claim=token, next_attempt_at=now + CLAIM_LEASE)
+    return list(OutboxMessage.objects.filter(claim=token).order_by("created_at", "pk"))
+
+
+def deliver_pending(now=None) -> int:
+    """Відправляє все, що настав час відправити. Повертає кількість доставлених повідомлень."""
+    if not is_configured():
+        return 0
+    now = now or timezone.now()
+    messages = _claim_due(now)
+    delivered = 0
+    max_attempts = _setting("TELEGRAM_MAX_ATTEMPTS", 8)
+
+    for indexes, text in merge_texts([m.text for m in messages]):
+        batch = [messages[i] for i in indexes]
+        ids = [m.pk for m in batch]
+        retry_after = None
+        try:
+            resp = _post(text)
+            data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {}
+            if resp.status_code == 200 and data.get("ok"):
+                OutboxMessage.objects.filter(pk__in=ids).update(
+                    status="sent", sent_at=timezone.now(), claim="", last_error=""
+                )
+                delivered += len(ids)
+                continue
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            error = f"HTTP {resp.status_code}: {data.get('description') or resp.text[:200]}"
+        except (requests.RequestException, ValueError) as e:
+            error = repr(e)
+
+        logger.warning("Telegram notify error (%s messages): %s", len(ids), error)
+        for m in batch:
+            m.attempts += 1
+            m.claim = ""
+            m.last_error = error
+            if m.attempts >= max_attempts:
+                m.status = "failed"
+            delay = timedelta(seconds=retry_after) if retry_after else backoff(m.attempts)
+            m.next_attempt_at = timezone.now() + delay
+        OutboxMessage.objects.bulk_update(batch, ["attempts", "claim", "last_error", "status", "next_attempt_at"])
+
+    return delivered
+
+
+def next_due_in(now=None) -> float | None:
+    """Через скільки секунд наступна спроба (None — черга порожня)."""
+    now = now or timezone.now()
+    nxt = (
+        OutboxMessage.objects.filter(status="pending")
+        .order_by("next_attempt_at")
+        .values_list("next_attempt_at", flat=True)
+        .first()
+    )
+    if nxt is None:
+        return None
+    return max((nxt - now).total_seconds(), 0.0)
+
+
+class _BackgroundSender:
+    """Фоновий потік у процесі вебсервера: живе, поки в черзі є pending."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self._event.set()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self._event.clear()
+                deliver_pending()
+                wait = next_due_in()
+                if wait is None:
+                    with self._lock:
+                        if not self._event.is_set():
+                            self._thread = None
+                            return
+                    continue
+                self._event.wait(timeout=max(wait, 0.5))
+        except Exception:
+            logger.exception("Telegram outbox sender crashed")
+            with self._lock:
+                self._thread = None
+        finally:
+            connections.close_all()  # з'єднання цього потоку
+
+
+sender = _BackgroundSender()
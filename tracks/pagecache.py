@@ -0,0 +1,354 @@
+"""
+Кеш готових HTML-сторінок (home, catalog, track_detail).
+
+Ключ — шлях + нормалізований query string; у записі зберігається номер
+«версії каталогу», яку піднімають сигнали Track/Genre (tracks/signals.py).
+Версія, записи і lock-и — у спільному кеші (caches["shared"], tracks/sharedcache.py),
+тож зміна в одному воркері чи в manage.py-команді видна всім. Хіт — лише читання
+по первинному ключу; запис у спільний файл (BEGIN IMMEDIATE) буває тільки на
+промаху. Протухлий запис перемальовує лише один воркер (lock через add), решта в
+цей час віддають стару копію. Разом зі сторінкою зберігається її gzip-копія —
+хіт не стискається наново в GZipMiddleware.
+
+Статистика хітів / промахів копиться в пам'яті процесу і зливається в спільний
+кеш не частіше ніж раз на STATS_FLUSH_INTERVAL, лише разом із записами промаху —
+тож у pagecache_stats вона трохи відстає.
+
+conditional_page — умовний GET поверх цього ж: ETag з версії каталогу і
+Last-Modified з часу останньої зміни, обидва з кешу; 304 віддається ще до
+кешу сторінок і до view.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.connection import ConnectionProxy
+from django.utils.http import http_date
+from django.utils import timezone
+from django.utils.text import compress_string
+
+from .models import Track
+
+VERSION_KEY = "catalog:version"
+MTIME_KEY = "catalog:mtime"
+STATS_KEYS = ("hits", "stale", "misses", "bypass")
+STATS_FLUSH_INTERVAL = 10  # сек
+LOCK_TIMEOUT = 30
+WAIT_STEP = 0.05  # якщо копії ще нема — чекаємо на того, хто рендерить
+WAIT_STEPS = 40
+
+# параметри, що не впливають на сторінку
+IGNORED_PARAMS = {"fbclid", "gclid", "yclid", "ref"}
+
+shared = ConnectionProxy(caches, "shared")  # як django.core.cache.cache, лише інший alias
+
+GZIP_MIN_LENGTH = 200  # як у GZipMiddleware: менше — не варто
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+def catalog_version() -> int:
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        # стартуємо з часу, а не з 1: після очистки кешу версії не повторяться
+        shared.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = shared.get(VERSION_KEY, 0)
+    return version
+
+
+def _bump() -> int:
+    shared.set(MTIME_KEY, timezone.now(), timeout=None)  # Last-Modified: час останньої зміни
+    catalog_version()
+    try:
+        return shared.incr(VERSION_KEY)
+    except ValueError:  # ключ зник між get та incr
+        version = int(time.time() * 1000)
+        shared.set(VERSION_KEY, version, timeout=None)
+        return version
+
+
+def bump_catalog_version() -> int:
+    version = _bump()
+    if transaction.get_connection().in_atomic_block:
+        # інший воркер міг між цим bump і COMMIT перемалювати сторінку зі старих даних
+        # і закешувати її під новою версією — після коміту піднімаємо ще раз
+        transaction.on_commit(_bump)
+    return version
+
+
+def normalized_query(request) -> str:
+    items = sorted(
+        (k, v)
+        for k, values in request.GET.lists()
+        if k not in IGNORED_PARAMS and not k.startswith("utm_")
+        for v in values
+        if v != ""
+    )
+    return "&".join(f"{k}={v}" for k, v in items)
+
+
+def page_cache_key(request) -> str:
+    raw = f"{request.path}?{normalized_query(request)}"
+    return "pagecache:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed = [time.monotonic()]
+
+
+def _stat(name):
+    with _stats_lock:
+        _stats[name] += 1
+    if name != "hits":  # хіт у спільний файл не пише — зливаємо лише поруч із записами промаху
+        _flush_stats()
+
+
+def _flush_stats(force=False):
+    with _stats_lock:
+        if not _stats or (not force and time.monotonic() - _stats_flushed[0] < STATS_FLUSH_INTERVAL):
+            return
+        pending = dict(_stats)
+        _stats.clear()
+        _stats_flushed[0] = time.monotonic()
+    for name, n in pending.items():
+        key = f"pagecache:stats:{name}"
+        shared.add(key, 0, timeout=None)
+        try:
+            shared.incr(key, n)
+        except ValueError:
+            pass
+
+
+def stats() -> dict:
+    _flush_stats(force=True)  # свої — одразу; інших воркерів — як злили
+    values = shared.get_many([f"pagecache:stats:{n}" for n in STATS_KEYS])
+    data = {n: values.get(f"pagecache:stats:{n}", 0) for n in STATS_KEYS}
+    served = data["hits"] + data["stale"]
+    total = served + data["misses"]
+    data["hit_ratio"] = served / total if total else 0.0
+    data["version"] = catalog_version()
+    return data
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+    shared.delete_many([f"pagecache:stats:{n}" for n in STATS_KEYS])
+
+
+def _from_entry(entry, state, request):
+    gzipped = entry.get("gzip")
+    if gzipped is not None and ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        response = HttpResponse(gzipped, content_type=entry["content_type"])
+        response["Content-Encoding"] = "gzip"  # GZipMiddleware такі пропускає
+    else:
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    patch_vary_headers(response, ("Accept-Encoding",))
+    response["X-Page-Cache"] = state
+    return response
+
+
+def _cacheable(request, response, session_accessed_before) -> bool:
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # сторінка залежить від сесії / CSRF-кукі — кешувати спільно не можна
+    session = getattr(request, "session", None)
+    if session is not None and session.accessed and not session_accessed_before:
+        return False
+    return not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+
+
+def _lookup(request, key, version):
+    """(відповідь з кешу або None, чи взяли lock на рендер)."""
+    entry = shared.get(key)
+    if entry and entry["version"] == version:
+        _stat("hits")
+        return _from_entry(entry, "hit", request), False
+    if shared.add(f"{key}:lock", 1, timeout=LOCK_TIMEOUT):
+        return None, True
+    # хтось інший вже рендерить — віддаємо стару копію або чекаємо свіжу
+    if entry:
+        _stat("stale")
+        return _from_entry(entry, "stale", request), False
+    return None, False
+
+
+def _fresh(request, key, version):
+    entry = shared.get(key)
+    if entry and entry["version"] == version:
+        _stat("hits")
+        return _from_entry(entry, "hit", request)
+    return None
+
+
+def _session_accessed(request):
+    session = getattr(request, "session", None)
+    return session.accessed if session is not None else False
+
+
+def _store(request, response, key, version, timeout, accessed_before):
+    if _cacheable(request, response, accessed_before):
+        content = response.content
+        shared.set(key, {
+            "version": version,
+            "content": content,
+            "gzip": compress_string(content) if len(content) >= GZIP_MIN_LENGTH else None,
+            "content_type": response["Content-Type"],
+        }, timeout)
+        _stat("misses")
+        response["X-Page-Cache"] = "miss"
+    else:
+        _stat("bypass")
+    return response
+
+
+def in_thread(func):
+    # не в потік ORM (thread_sensitive): спільний кеш має свої з'єднання на потік
+    return sync_to_async(func, thread_sensitive=False)
+
+
+def _skip(request):
+    return request.method not in ("GET", "HEAD") or not getattr(settings, "PAGE_CACHE_ENABLED", True)
+
+
+def versioned_page_cache(timeout=60 * 60):
+    """
+    Працює і з sync, і з async view. В async хіт — одне читання по первинному ключу
+    локального SQLite-файлу, його робимо прямо з event loop; lock, збереження і
+    статистика пишуть у файл (можуть чекати на блокування) — ті в потоці.
+    Чекання на lock — asyncio.sleep.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if _skip(request):
+                    return await view(request, *args, **kwargs)
+
+                key, version = page_cache_key(request), catalog_version()
+                response = _fresh(request, key, version)
+                if response is not None:
+                    return response
+                response, locked = await in_thread(_lookup)(request, key, version)
+                if response is not None:
+                    return response
+                if not locked:
+                    for _ in range(WAIT_STEPS):
+                        await asyncio.sleep(WAIT_STEP)
+                        response = _fresh(request, key, version)
+                        if response is not None:
+                            return response
+                    await in_thread(_stat)("bypass")
+                    return await view(request, *args, **kwargs)
+
+                try:
+                    accessed_before = _session_accessed(request)
+                    response = await view(request, *args, **kwargs)
+                    return await in_thread(_store)(request, response, key, version, timeout, accessed_before)
+                finally:
+                    await in_thread(shared.delete)(f"{key}:lock")
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if _skip(request):
+                return view(request, *args, **kwargs)
+
+            key, version = page_cache_key(request), catalog_version()
+            response, locked = _lookup(request, key, version)
+            if response is not None:
+                return response
+            if not locked:
+                for _ in range(WAIT_STEPS):
+                    time.sleep(WAIT_STEP)
+                    response = _fresh(request, key, version)
+                    if response is not None:
+                        return response
+                _stat("bypass")
+                return view(request, *args, **kwargs)
+
+            try:
+                accessed_before = _session_accessed(request)
+                response = view(request, *args, **kwargs)
+                return _store(request, response, key, version, timeout, accessed_before)
+            finally:
+                shared.delete(f"{key}:lock")
+
+        return wrapper
+
+    return decorator
+
+
+def catalog_last_modified(*args, **kwargs):
+    """
+    Коли каталог востаннє змінювався: час останнього bump_catalog_version, а до
+    першого (свіжий процес, очищений кеш) — max(updated_at), один запит.
+    Видалення теж рахується — на відміну від голого max(updated_at).
+    """
+    modified = shared.get(MTIME_KEY)
+    if modified is None:
+        modified = Track.objects.aggregate(m=Max("updated_at"))["m"]
+        if modified is not None:
+            shared.add(MTIME_KEY, modified, timeout=None)
+    return modified
+
+
+def conditional_page(last_modified_func=catalog_last_modified):
+    """
+    Умовний GET: ETag — версія каталогу (жодного запиту), Last-Modified —
+    last_modified_func(request, *args, **kwargs). Ставиться над versioned_page_cache.
+    ETag слабкий: тіло буває і стиснуте, і ні. Cache-Control: no-cache — браузер
+    щоразу перепитує (дешевий 304), а не вгадує свіжість з Last-Modified.
+    """
+    def validators(request, *args, **kwargs):
+        etag = f'W/"{catalog_version()}"'
+        modified = last_modified_func(request, *args, **kwargs)
+        modified = int(modified.timestamp()) if modified else None
+        return get_conditional_response(request, etag=etag, last_modified=modified), etag, modified
+
+    def finish(request, response, etag, modified):
+        if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            if modified and not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(modified)
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                # last_modified_func може піти в БД — у потік ORM
+                response, etag, modified = await sync_to_async(validators)(request, *args, **kwargs)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(request, response, etag, modified)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            response, etag, modified = validators(request, *args, **kwargs)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return finish(request, response, etag, modified)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,238 @@
+"""
+Keyset (cursor) пагінація: сторінка — це WHERE по ключу сортування останнього
+рядка попередньої сторінки, без OFFSET і без COUNT(*) на кожен запит.
+
+Курсор — непрозорий base64-токен: {"d": напрям, "k": ключ, "o": зсув першого рядка}.
+Зсув потрібен лише для «Показано X–Y з Z»; старі ?page=N теж працюють (через OFFSET).
+"""
+import base64
+import binascii
+import json
+import math
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT, PREV, LAST = "n", "p", "l"
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict | None:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+    except (ValueError, binascii.Error, TypeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def cached_count(queryset, key: str, timeout=300) -> int:
+    """Загальна кількість — з кешу; COUNT(*) лише коли ключ протух."""
+    return cache.get_or_set(f"pagination:count:{key}", queryset.count, timeout)
+
+
+class KeysetPage:
+    def __init__(self, paginator, object_list, offset, has_previous, has_next):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.offset = offset
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def number(self):
+        return self.offset // self.paginator.per_page + 1
+
+    @property
+    def num_pages(self):
+        return self.paginator.num_pages
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.paginator.key_of(self.object_list[-1])
+        return encode_cursor({"d": NEXT, "k": last, "o": self.end_index()})
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return None
+        first = self.paginator.key_of(self.object_list[0])
+        return encode_cursor({"d": PREV, "k": first, "o": max(self.offset - self.paginator.per_page, 0)})
+
+    @property
+    def last_cursor(self):
+        return encode_cursor({"d": LAST}) if self.has_next else None
+
+
+class KeysetPaginator:
+    """
+    ordering — повний унікальний порядок, напр. ("-is_featured", "-created_at", "id").
+    count_key — ключ кешу для загальної кількості (різний для різних фільтрів).
+    """
+
+    def __init__(self, queryset, ordering, per_page, count_key):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.count_key = count_key
+        self.fields = [o.lstrip("-") for o in self.ordering]
+        self.descending = [o.startswith("-") for o in self.ordering]
+        self._count = None
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = cached_count(self.queryset, self.count_key)
+        return self._count
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    def key_of(self, obj):
+        return [getattr(obj, f) for f in self.fields]
+
+    def _parse_key(self, values):
+        model = self.queryset.model
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise ValueError("bad cursor key")
+        return [model._meta.get_field(f).to_python(v) for f, v in zip(self.fields, values)]
+
+    def _after(self, key, forward=True):
+        """WHERE для рядків, що йдуть після key (forward) або перед ним."""
+        cond = Q()
+        for i, (field, desc) in enumerate(zip(self.fields, self.descending)):
+            op = "lt" if desc == forward else "gt"
+            term = Q(**{f"{field}__{op}": key[i]})
+            for prev_field, prev_value in zip(self.fields[:i], key[:i]):
+                term &= Q(**{prev_field: prev_value})
+            cond |= term
+        return cond
+
+    def _reversed_ordering(self):
+        return [o[1:] if o.startswith("-") else f"-{o}" for o in self.ordering]
+
+    def _first_page(self, offset=0):
+        rows = list(self.queryset.order_by(*self.ordering)[offset:offset + self.per_page + 1])
+        return KeysetPage(self, rows[:self.per_page], offset, offset > 0, len(rows) > self.per_page)
+
+    def page_by_number(self, number):
+        """Сумісність зі старими ?page=N — разовий OFFSET."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(number, self.num_pages)
+        return self._first_page((number - 1) * self.per_page)
+
+    def page(self, cursor=None, page_number=None):
+        data = decode_cursor(cursor) if cursor else None
+        if data is None:
+            if page_number is not None:
+                return self.page_by_number(page_number)
+            return self._first_page()
+
+        direction = data.get("d")
+        if direction == LAST:
+            offset = (self.num_pages - 1) * self.per_page
+            size = max(self.count - offset, 0) or self.per_page
+            rows = list(self.queryset.order_by(*self._reversed_ordering())[:size])[::-1]
+            return KeysetPage(self, rows, offset, offset > 0, False)
+
+        try:
+            key = self._parse_key(data.get("k"))
+            offset = max(int(data.get("o", 0)), 0)
+        except (ValueError, TypeError, LookupError, ValidationError):  # to_python() кидає ValidationError
+            return self._first_page()
+
+        if direction == PREV:
+            qs = self.queryset.filter(self._after(key, forward=False)).order_by(*self._reversed_ordering())
+            rows = list(qs[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(self, rows, offset if has_previous else 0, has_previous, True)
+
+        rows = list(self.queryset.filter(self._after(key)).order_by(*self.ordering)[:self.per_page + 1])
+        return KeysetPage(self, rows[:self.per_page], offset, True, len(rows) > self.per_page)
+
+
+class RankedPaginator:
+    """
+    Пагінація готового списку id (напр. результатів пошуку за релевантністю).
+    Ті самі сторінки й курсори, що й у KeysetPaginator, але курсор несе лише зсув:
+    список фіксований, тож OFFSET тут — зріз Python-списку, а не запит.
+    total — скільки всього збігів, якщо ids обрізаний лімітом (search.RESULTS_LIMIT):
+    його показуємо як «з Z», а гортати можна лише ids.
+    """
+
+    def __init__(self, queryset, ids, per_page, total=None):
+        self.queryset = queryset
+        self.ids = list(ids)
+        self.per_page = per_page
+        self.total = max(total or 0, len(self.ids))
+
+    @property
+    def count(self):
+        return self.total
+
+    @property
+    def truncated(self):
+        return self.total > len(self.ids)
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(len(self.ids) / self.per_page), 1)
+
+    def key_of(self, obj):
+        return obj.pk
+
+    def _page_at(self, offset):
+        offset = min(max(offset, 0), (self.num_pages - 1) * self.per_page)
+        ids = self.ids[offset:offset + self.per_page]
+        objects = self.queryset.in_bulk(ids)
+        rows = [objects[pk] for pk in ids if pk in objects]
+        return KeysetPage(self, rows, offset, offset > 0, offset + self.per_page < len(self.ids))
+
+    def page(self, cursor=None, page_number=None):
+        data = decode_cursor(cursor) if cursor else None
+        if data is None:
+            try:
+                number = max(int(page_number or 1), 1)
+            except (TypeError, ValueError):
+                number = 1
+            return self._page_at((number - 1) * self.per_page)
+        if data.get("d") == LAST:
+            return self._page_at((self.num_pages - 1) * self.per_page)
+        try:
+            return self._page_at(int(data.get("o", 0)))
+        except (TypeError, ValueError):
+            return self._page_at(0)
@@ -0,0 +1,265 @@
+"""
+Постійна інструментація запитів: час усього запиту, SQL (кількість і час),
+рендер шаблонів і вихідні HTTP-виклики.
+
+* Server-Timing у кожній відповіді — видно прямо в DevTools;
+* ковзні гістограми по view в пам'яті процесу (останні PERF_WINDOWS вікон по
+  PERF_WINDOW_SECONDS) — /admin/perf.json, лише для staff;
+* повільні запити (> PERF_SLOW_MS) — у лог tracks.perf з найдовшими SQL.
+
+Накладні витрати — кілька perf_counter() на запит і один на кожен SQL.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TOP_QUERIES = 3
+
+_current = contextvars.ContextVar("perf_metrics", default=None)
+
+
+class Metrics:
+    __slots__ = ("started", "sql_count", "sql_time", "tpl_time", "rendering", "http_count", "http_time", "slowest")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.tpl_time = 0.0
+        self.rendering = False
+        self.http_count = 0
+        self.http_time = 0.0
+        self.slowest = []  # [(сек, sql)] — не більше TOP_QUERIES
+
+    def add_query(self, duration, sql):
+        self.sql_count += 1
+        self.sql_time += duration
+        if len(self.slowest) < TOP_QUERIES or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, sql))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[TOP_QUERIES:]
+
+    def server_timing(self, total):
+        parts = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f"tpl;dur={self.tpl_time * 1000:.1f}",
+        ]
+        if self.http_count:
+            parts.append(f'http;dur={self.http_time * 1000:.1f};desc="{self.http_count} calls"')
+        return ", ".join(parts)
+
+
+def http_response_hook(response, *args, **kwargs):
+    """Хук requests.Session: час вихідного запиту з response.elapsed."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.http_count += 1
+        metrics.http_time += response.elapsed.total_seconds()
+
+
+# рендер шаблонів: один обгорт над бекендом Django (include-и рахуються всередині,
+# а вкладені рендери — віджети форм теж ідуть через бекенд — не рахуються вдруге)
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    metrics = _current.get()
+    if metrics is None or metrics.rendering:
+        return _original_render(self, context, request)
+    metrics.rendering = True
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        metrics.tpl_time += time.perf_counter() - started
+        metrics.rendering = False
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+
+    def add(self, ms, metrics):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.sql_count += metrics.sql_count
+        self.sql_ms += metrics.sql_time * 1000
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum_ms += other.sum_ms
+        self.sql_count += other.sql_count
+        self.sql_ms += other.sql_ms
+
+    def percentile(self, p):
+        if not self.total:
+            return None
+        rank = p * self.total
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else float("inf")  # верхня межа кошика
+
+    def as_dict(self):
+        return {
+            "requests": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+            "p50_ms_le": self.percentile(0.50),
+            "p95_ms_le": self.percentile(0.95),
+            "p99_ms_le": self.percentile(0.99),
+            "avg_queries": round(self.sql_count / self.total, 2) if self.total else None,
+            "avg_sql_ms": round(self.sql_ms / self.total, 2) if self.total else None,
+            "buckets": dict(zip([*map(str, BUCKETS_MS), "inf"], self.counts)),
+        }
+
+
+class RollingHistograms:
+    """view → гістограма за останні windows вікон по window_seconds."""
+
+    def __init__(self, window_seconds=300, windows=12):
+        self.window_seconds = window_seconds
+        self._windows = deque(maxlen=windows)  # [(номер вікна, {view: _Histogram})]
+        self._lock = threading.Lock()
+
+    def add(self, view, ms, metrics, now=None):
+        slot = int((time.time() if now is None else now) // self.window_seconds)
+        with self._lock:
+            if not self._windows or self._windows[-1][0] != slot:
+                self._windows.append((slot, {}))
+            self._windows[-1][1].setdefault(view, _Histogram()).add(ms, metrics)
+
+    def snapshot(self, now=None):
+        oldest = int((time.time() if now is None else now) // self.window_seconds) - self._windows.maxlen + 1
+        merged = {}
+        with self._lock:
+            for slot, views in self._windows:
+                if slot < oldest:
+                    continue
+                for view, hist in views.items():
+                    merged.setdefault(view, _Histogram()).merge(hist)
+        return {view: hist.as_dict() for view, hist in sorted(merged.items())}
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+
+histograms = RollingHistograms(
+    getattr(settings, "PERF_WINDOW_SECONDS", 300), getattr(settings, "PERF_WINDOWS", 12)
+)
+
+
+def _record_sql(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started, sql)
+
+
+def _install_sql_wrapper(connection, **kwargs):
+    # постійний обгорт на кожному з'єднанні, а метрики — з contextvar: так SQL з async view
+    # (ORM у потоці sync_to_async, зі своїм з'єднанням) теж потрапляє в метрики запиту
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+def install():
+    """
+    Обгорт рендеру шаблонів і SQL — з TracksConfig.ready(), а не при імпорті модуля,
+    і лише коли PerfMiddleware стоїть у MIDDLEWARE і PERF_ENABLED не вимкнено:
+    інакше метрик все одно ніхто не збирає.
+    """
+    if f"{__name__}.PerfMiddleware" not in settings.MIDDLEWARE or not getattr(settings, "PERF_ENABLED", True):
+        return False
+    DjangoTemplate.render = _timed_render
+    connection_created.connect(_install_sql_wrapper, dispatch_uid="tracks.perf")
+    return True
+
+
+class PerfMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for conn in connections.all(initialized_only=True):  # відкриті ще до нас
+            _install_sql_wrapper(conn)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, "PERF_ENABLED", True):
+            return self.get_response(request)
+
+        metrics = Metrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not getattr(settings, "PERF_ENABLED", True):
+            return await self.get_response(request)
+
+        metrics = Metrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        response["Server-Timing"] = metrics.server_timing(total)
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        histograms.add(view, total * 1000, metrics)
+
+        if total * 1000 > getattr(settings, "PERF_SLOW_MS", 500):
+            logger.warning(
+                "Повільний запит %s %s → %s: %.0f ms, SQL %d / %.0f ms, шаблони %.0f ms, HTTP %.0f ms; найдовші SQL: %s",
+                request.method, request.get_full_path(), view, total * 1000, metrics.sql_count,
+                metrics.sql_time * 1000, metrics.tpl_time * 1000, metrics.http_time * 1000,
+                " | ".join(f"{d * 1000:.1f} ms {sql[:200]}" for d, sql in metrics.slowest),
+            )
+        return response
+
+
+@staff_member_required
+def stats_view(request):
+    return JsonResponse({
+        "window_seconds": histograms.window_seconds,
+        "windows": histograms._windows.maxlen,
+        "views": histograms.snapshot(),
+    })
@@ -0,0 +1,185 @@
+"""
+Rate limit зі спільним станом для всіх воркерів (gunicorn, кілька процесів).
+
+Алгоритм — sliding window на двох фіксованих вікнах:
+    оцінка = запити в поточному вікні + запити в попередньому * (частка, що ще «в ковзному вікні»).
+Стан — окремий SQLite-файл (RATELIMIT_DB) через stdlib sqlite3, не LocMemCache:
+перевірка й інкремент ідуть в одній транзакції BEGIN IMMEDIATE, тож між процесами
+це атомарно, а вартість — два звернення по первинному ключу, O(1).
+
+IP клієнта — з X-Forwarded-For лише тоді, коли запит прийшов від довіреного проксі
+(RATELIMIT_TRUSTED_PROXIES); інакше заголовок може підробити будь-хто.
+"""
+import ipaddress
+import os
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+CLEANUP_CHANCE = 1 / 256  # час від часу прибираємо протухлі вікна
+BUSY_TIMEOUT = 5  # сек — скільки чекати на блокування файлу іншим процесом
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, window)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_window ON buckets (window);
+"""
+
+UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+_local = threading.local()
+
+
+def parse_rate(rate):
+    """'5/10m' → (5, 600); '100/h' → (100, 3600)."""
+    limit, period = rate.split("/")
+    number = period[:-1] or "1"
+    return int(limit), int(number) * UNITS[period[-1]]
+
+
+def _db_path():
+    return str(getattr(settings, "RATELIMIT_DB", "ratelimit.sqlite3"))
+
+
+def _connection():
+    """Окреме з'єднання на потік і процес (після fork старе не використовуємо)."""
+    path = _db_path()
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.owner != (os.getpid(), path):
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn, _local.owner = conn, (os.getpid(), path)
+    return conn
+
+
+def hit(key, limit, period, now=None):
+    """
+    Рахує запит для key, якщо він вкладається в ліміт.
+    Повертає (дозволено, оцінка_після, retry_after_сек).
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = (now % period) / period
+
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = dict(conn.execute(
+            "SELECT window, count FROM buckets WHERE key = ? AND window IN (?, ?)",
+            (key, window, window - 1),
+        ).fetchall())
+        current, previous = rows.get(window, 0), rows.get(window - 1, 0)
+        estimate = current + previous * (1 - elapsed)
+        allowed = estimate + 1 <= limit
+        if allowed:
+            conn.execute(
+                "INSERT INTO buckets (key, window, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+                (key, window),
+            )
+            estimate += 1
+        if random.random() < CLEANUP_CHANCE:
+            conn.execute("DELETE FROM buckets WHERE window < ?", (window - 1,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if allowed:
+        return True, estimate, 0
+    # коли частка попереднього вікна «вивітриться» достатньо (але не пізніше за наступне вікно)
+    wait = 1 - elapsed
+    if previous and current < limit:
+        wait = min(max(1 - (limit - 1 - current) / previous - elapsed, 0), wait)
+    return False, estimate, int(wait * period) + 1
+
+
+def _trusted_networks():
+    return [ipaddress.ip_network(n, strict=False) for n in getattr(settings, "RATELIMIT_TRUSTED_PROXIES", [])]
+
+
+def _parse_ip(value):
+    try:
+        return ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+
+
+def client_ip(request):
+    """
+    REMOTE_ADDR, або — якщо він довірений проксі — найправіша недовірена адреса
+    з X-Forwarded-For (ліві значення клієнт може дописати сам).
+    """
+    remote = _parse_ip(request.META.get("REMOTE_ADDR", ""))
+    trusted = _trusted_networks()
+
+    def is_trusted(ip):
+        return any(ip in net for net in trusted)
+
+    if remote is None or not is_trusted(remote):
+        return str(remote) if remote else ""
+    chain = [_parse_ip(p) for p in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")]
+    chain = [ip for ip in chain if ip is not None]
+    for ip in reversed(chain):
+        if not is_trusted(ip):
+            return str(ip)
+    return str(chain[0]) if chain else str(remote)
+
+
+def _too_many(retry_after):
+    response = HttpResponse("Забагато спроб. Спробуй пізніше, братан.", status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def ratelimit(rate, scope=None, methods=("POST",), key=client_ip):
+    """
+    Декоратор view: @ratelimit("5/10m") — не більше 5 POST за 10 хв з IP.
+    Понад ліміт — 429 з Retry-After.
+    """
+    limit, period = parse_rate(rate)
+
+    def decorator(view):
+        name = scope or view.__name__
+
+        def checked(request):
+            return request.method in methods and getattr(settings, "RATELIMIT_ENABLED", True)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if checked(request):
+                    # з'єднання в hit() — своє на потік, тож можна в пулі потоків, а не в
+                    # єдиному thread-sensitive потоці, де живе ORM
+                    allowed, _, retry_after = await sync_to_async(hit, thread_sensitive=False)(
+                        f"{name}:{key(request)}", limit, period
+                    )
+                    if not allowed:
+                        return _too_many(retry_after)
+                return await view(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if checked(request):
+                allowed, _, retry_after = hit(f"{name}:{key(request)}", limit, period)
+                if not allowed:
+                    return _too_many(retry_after)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Індекс «схожих треків» (RelatedTrack): топ-K сусідів для кожного треку.
+
+score = (1 - RECENCY_WEIGHT) * Jaccard(жанри A, жанри B) + RECENCY_WEIGHT * свіжість B,
+де свіжість = 0.5 ** (вік у днях / RECENCY_HALF_LIFE_DAYS).
+
+Кандидати — треки зі спільними жанрами, але з кожного жанру беремо лише
+CANDIDATES_PER_GENRE найсвіжіших, інакше популярний тег (male/female) робить
+перерахунок квадратичним. Повний перерахунок — `manage.py rebuild_related`
+(варто ганяти раз на добу: свіжість з часом змінюється).
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+TOP_K = 12
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_DAYS = 90
+CANDIDATES_PER_GENRE = 300
+WRITE_BATCH = 2000
+
+
+def score(genres_a, genres_b, created_b, now):
+    union = len(genres_a | genres_b)
+    if not union:
+        return 0.0
+    jaccard = len(genres_a & genres_b) / union
+    if not jaccard:
+        return 0.0
+    age_days = max((now - created_b).total_seconds() / 86400, 0)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    return (1 - RECENCY_WEIGHT) * jaccard + RECENCY_WEIGHT * recency
+
+
+def build_genre_index(genre_sets, created):
+    """genre_id → до CANDIDATES_PER_GENRE найсвіжіших track_id."""
+    index = defaultdict(list)
+    for track_id, genres in genre_sets.items():
+        for genre_id in genres:
+            index[genre_id].append(track_id)
+    for genre_id, ids in index.items():
+        ids.sort(key=lambda pk: created[pk], reverse=True)
+        del ids[CANDIDATES_PER_GENRE:]
+    return index
+
+
+def top_k(track_id, genre_sets, created, index, now, k=TOP_K):
+    genres = genre_sets.get(track_id) or set()
+    candidates = {pk for g in genres for pk in index.get(g, ())}
+    candidates.discard(track_id)
+    scored = (
+        (score(genres, genre_sets[pk], created[pk], now), pk)
+        for pk in candidates
+    )
+    return [(pk, s) for s, pk in heapq.nlargest(k, scored) if s > 0]
+
+
+def compute_all(genre_sets, created, now=None):
+    """Чиста функція для повного перерахунку: yield (track_id, related_id, score)."""
+    now = now or timezone.now()
+    index = build_genre_index(genre_sets, created)
+    for track_id in genre_sets:
+        for related_id, s in top_k(track_id, genre_sets, created, index, now):
+            yield track_id, related_id, s
+
+
+def _load_genre_sets(Track, track_ids=None):
+    Through = Track.genres.through
+    qs = Through.objects.all()
+    if track_ids is not None:
+        qs = qs.filter(track_id__in=track_ids)
+    genre_sets = defaultdict(set)
+    for track_id, genre_id in qs.values_list("track_id", "genre_id").iterator(chunk_size=5000):
+        genre_sets[track_id].add(genre_id)
+    return genre_sets
+
+
+def rebuild_all():
+    """Повний перерахунок."""
+    from .models import RelatedTrack, Track
+
+    genre_sets = _load_genre_sets(Track)
+    created = dict(Track.objects.values_list("pk", "created_at").iterator(chunk_size=5000))
+    for pk in created:
+        genre_sets.setdefault(pk, set())
+
+    total = 0
+    with transaction.atomic():
+        RelatedTrack.objects.all().delete()
+        batch = []
+        for track_id, related_id, s in compute_all(genre_sets, created):
+            batch.append(RelatedTrack(track_id=track_id, related_id=related_id, score=s))
+            if len(batch) >= WRITE_BATCH:
+                RelatedTrack.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        RelatedTrack.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _candidates_for(genre_ids):
+    """До CANDIDATES_PER_GENRE найсвіжіших треків кожного жанру — одним запитом з ROW_NUMBER()."""
+    from .models import Track
+
+    if not genre_ids:
+        return set()
+    ranked = (
+        Track.genres.through.objects.filter(genre_id__in=genre_ids)
+        .annotate(rn=Window(RowNumber(), partition_by=F("genre_id"), order_by=F("track__created_at").desc()))
+        .filter(rn__lte=CANDIDATES_PER_GENRE)
+        .values_list("track_id", flat=True)
+    )
+    return set(ranked)
+
+
+def refresh_for(track_ids):
+    """
+    Інкрементальне оновлення після зміни жанрів (або видалення) track_ids:
+      * самі треки і ті, в чиїх списках вони вже є — перераховуються повністю;
+      * інші треки зі спільними жанрами — лише вставка змінених, якщо вони потрапляють у топ-K.
+    """
+    from .models import RelatedTrack, Track
+
+    changed = set(Track.objects.filter(pk__in=track_ids).values_list("pk", flat=True))
+    holders = set(
+        RelatedTrack.objects.filter(related_id__in=track_ids).values_list("track_id", flat=True)
+    )
+    full = changed | holders
+    if not full:
+        return
+
+    full_sets = _load_genre_sets(Track, full)
+    peers = _candidates_for({g for genres in full_sets.values() for g in genres})
+    all_ids = full | peers
+    genre_sets = _load_genre_sets(Track, all_ids)
+    created = dict(Track.objects.filter(pk__in=all_ids).values_list("pk", "created_at"))
+    for pk in created:
+        genre_sets.setdefault(pk, set())
+    full &= created.keys()
+    index = build_genre_index(genre_sets, created)
+    now = timezone.now()
+
+    with transaction.atomic():
+        RelatedTrack.objects.filter(track_id__in=full).delete()
+        RelatedTrack.objects.bulk_create([
+            RelatedTrack(track_id=pk, related_id=related_id, score=s)
+            for pk in full
+            for related_id, s in top_k(pk, genre_sets, created, index, now)
+        ])
+
+        # сусіди: чи заходять змінені треки в їхній топ-K
+        others = peers - full
+        if not others or not changed:
+            return
+        rows = defaultdict(dict)  # peer → {related_id: (row_id, score)}
+        for row_id, pk, related_id, s in RelatedTrack.objects.filter(track_id__in=others).values_list(
+            "pk", "track_id", "related_id", "score"
+        ):
+            rows[pk][related_id] = (row_id, s)
+
+        to_create, to_delete = [], []
+        for pk in others:
+            # others не містять changed у списках (інакше були б у holders)
+            current = rows[pk]
+            for t in changed & created.keys():
+                s = score(genre_sets[pk], genre_sets[t], created[t], now)
+                if s > 0:
+                    current[t] = (None, s)
+            ranked = sorted(current.items(), key=lambda item: item[1][1], reverse=True)
+            to_create += [
+                RelatedTrack(track_id=pk, related_id=related_id, score=s)
+                for related_id, (row_id, s) in ranked[:TOP_K]
+                if row_id is None
+            ]
+            to_delete += [row_id for _, (row_id, _) in ranked[TOP_K:] if row_id is not None]
+
+        if to_delete:
+            RelatedTrack.objects.filter(pk__in=to_delete).delete()
+        if to_create:
+            RelatedTrack.objects.bulk_create(to_create, ignore_conflicts=True)
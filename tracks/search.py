@@ -0,0 +1,172 @@
+"""
+Повнотекстовий пошук по каталогу: SQLite FTS5-таблиця tracks_track_search
+(rowid = Track.id; колонки title, genres, description і службова tags — «g<id>» жанрів,
+щоб фільтр ?genre= теж був частиною MATCH, а не підзапитом).
+
+Індекс оновлюють сигнали (tracks/signals.py) та імпорт; повний перерахунок —
+`manage.py rebuild_search`. Запит користувача розбивається на слова, кожне
+шукається як префікс ("тра"* знайде «трап»), ранжування — bm25 з вагами колонок.
+На не-SQLite базі таблиці нема — тоді простий icontains по назві.
+"""
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+TABLE = "tracks_track_search"
+WEIGHTS = (10.0, 4.0, 1.0, 0.0)  # title, genres, description, tags
+MAX_TERMS = 8
+# bm25 рахується лише для RESULTS_LIMIT найновіших збігів (FTS5 віддає rowid DESC без сортування),
+# інакше запит на кшталт «da» ранжує десятки тисяч рядків; вузькі запити ранжуються повністю
+RESULTS_LIMIT = 500
+RESULTS_CACHE_TIMEOUT = 300
+CHUNK = 500
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# жанри треку одним рядком — те саме, що бачить відвідувач на картці
+_SELECT_ROWS = """
+    SELECT t.id, t.title,
+           COALESCE((SELECT group_concat(g.name, ' ')
+                     FROM tracks_track_genres tg JOIN tracks_genre g ON g.id = tg.genre_id
+                     WHERE tg.track_id = t.id), ''),
+           t.description,
+           COALESCE((SELECT group_concat('g' || tg.genre_id, ' ')
+                     FROM tracks_track_genres tg WHERE tg.track_id = t.id), '')
+    FROM tracks_track t
+"""
+
+
+def available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def build_match(query) -> str | None:
+    """'Dark tr' → '"dark"* "tr"*' (усі слова обов'язкові, кожне — префікс)."""
+    terms = WORD_RE.findall((query or "").lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _fts_query(match, genre_id=None):
+    # слова користувача шукаємо лише в текстових колонках, жанр — у tags
+    expr = f"{{title genres description}} : ({match})"
+    if genre_id:
+        expr += f" AND tags : g{int(genre_id)}"
+    return expr
+
+
+def _reindex(cursor, ids_sql=None, params=()):
+    """ids_sql — SQL-список id (напр. '%s, %s' або підзапит); None — усі треки."""
+    delete = f"DELETE FROM {TABLE}"
+    insert = f"INSERT INTO {TABLE} (rowid, title, genres, description, tags) {_SELECT_ROWS}"
+    if ids_sql is not None:
+        delete += f" WHERE rowid IN ({ids_sql})"
+        insert += f" WHERE t.id IN ({ids_sql})"
+    cursor.execute(delete, params)
+    cursor.execute(insert, params)
+
+
+def index_tracks(track_ids):
+    if not available():
+        return
+    track_ids = list(track_ids)
+    with connection.cursor() as cursor:
+        for i in range(0, len(track_ids), CHUNK):
+            chunk = track_ids[i:i + CHUNK]
+            _reindex(cursor, ", ".join(["%s"] * len(chunk)), chunk)
+
+
+def index_genre(genre_id):
+    """Перейменування жанру — переіндексувати всі його треки."""
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        _reindex(cursor, "SELECT track_id FROM tracks_track_genres WHERE genre_id = %s", [genre_id])
+
+
+def remove_tracks(track_ids):
+    track_ids = list(track_ids)
+    if not available() or not track_ids:
+        return
+    with connection.cursor() as cursor:
+        for i in range(0, len(track_ids), CHUNK):
+            chunk = track_ids[i:i + CHUNK]
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def rebuild():
+    """Повний перерахунок + optimize (злиття сегментів індексу)."""
+    if not available():
+        return 0
+    with connection.cursor() as cursor:
+        _reindex(cursor)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def ranked_ids(query, genre_id=None, limit=RESULTS_LIMIT):
+    """id треків за релевантністю (найкращі першими)."""
+    match = build_match(query)
+    if match is None:
+        return []
+    if not available():
+        from .models import Track
+
+        qs = Track.objects.filter(title__icontains=query.strip())
+        if genre_id:
+            qs = qs.filter(genres=genre_id)
+        return list(qs.order_by("-created_at").values_list("pk", flat=True)[:limit])
+
+    weights = ", ".join(map(str, WEIGHTS))
+    sql = (
+        f"SELECT rowid FROM (SELECT rowid, bm25({TABLE}, {weights}) AS score FROM {TABLE}"
+        f" WHERE {TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s) ORDER BY score, rowid DESC"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_fts_query(match, genre_id), limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching_ids(query):
+    """Усі id, що відповідають запиту, без ранжування і RESULTS_LIMIT — для «з Z» і фасетів."""
+    match = build_match(query)
+    if match is None:
+        return []
+    if not available():
+        from .models import Track
+
+        return list(Track.objects.filter(title__icontains=query.strip()).values_list("pk", flat=True))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [_fts_query(match)])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def cached_matches(query, version=0):
+    """Бітсет усіх збігів (facets.bitset) з кешу: int-бітсет у кеші компактніший за список id."""
+    from .facets import bitset
+
+    match = build_match(query) or ""
+    key = "search:matches:{}:{}".format(version, hashlib.md5(match.encode()).hexdigest())
+    return cache.get_or_set(key, lambda: bitset(matching_ids(query)), RESULTS_CACHE_TIMEOUT)
+
+
+def cached_ranked_ids(query, genre_id=None, version=0):
+    """Те саме, але з кешу: гортання сторінок не повторює пошук."""
+    match = build_match(query) or ""
+    key = "search:{}:{}:{}".format(version, genre_id or "all", hashlib.md5(match.encode()).hexdigest())
+    return cache.get_or_set(key, lambda: ranked_ids(query, genre_id), RESULTS_CACHE_TIMEOUT)
+
+
+def filter_queryset(queryset, query):
+    """Обмежити queryset треками, що відповідають запиту (без сортування — для адмінки)."""
+    match = build_match(query)
+    if match is None:
+        return queryset
+    if not available():
+        return queryset.filter(title__icontains=query.strip())
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [_fts_query(match)]))
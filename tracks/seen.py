@@ -0,0 +1,78 @@
+"""
+Дедуплікація переглядів без сесії: підписана кукі з обмеженим набором
+«трек → коли бачив», замість словника viewed_tracks у сесії, що ріс без меж
+і переписував увесь рядок django_session на кожен перегляд.
+
+Формат значення: "id.хвилина|id.хвилина|..." (base36), не більше SEEN_MAX записів;
+записи, старші за VIEW_COOLDOWN, і найстаріші понад ліміт відкидаються.
+Боти не рахуються і кукі не отримують.
+"""
+import re
+import time
+
+VIEW_COOLDOWN = 60 * 60  # 1 година
+SEEN_MAX = 40  # ~500 байт — вартість стала, скільки б треків не переглянули
+COOKIE_NAME = "seen"
+CLICKS_COOKIE_NAME = "seen_clicks"  # те саме для кліків «Замовити» (views.order_click)
+COOKIE_SALT = "tracks.seen"
+
+BOT_RE = re.compile(
+    r"bot|crawl|spider|slurp|archiver|facebookexternalhit|embedly|preview|"
+    r"headless|lighthouse|curl|wget|python-requests|httpx|go-http-client",
+    re.IGNORECASE,
+)
+
+
+def is_bot(request):
+    return bool(BOT_RE.search(request.META.get("HTTP_USER_AGENT", "")))
+
+
+def _b36(n):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+class SeenTracks:
+    def __init__(self, entries=None, now=None, name=COOKIE_NAME):
+        self.name = name
+        self.now = int(time.time() if now is None else now) // 60
+        cutoff = self.now - VIEW_COOLDOWN // 60
+        self.entries = {pk: ts for pk, ts in (entries or {}).items() if ts > cutoff}
+        self.changed = False
+
+    @classmethod
+    def from_request(cls, request, now=None, name=COOKIE_NAME):
+        raw = request.get_signed_cookie(name, default="", salt=COOKIE_SALT)
+        entries = {}
+        for item in raw.split("|") if raw else ():
+            try:
+                pk, ts = item.split(".")
+                entries[int(pk, 36)] = int(ts, 36)
+            except ValueError:
+                continue
+        return cls(entries, now, name)
+
+    def add(self, track_id):
+        """True — перегляд новий (треба рахувати)."""
+        if track_id in self.entries:
+            return False
+        self.entries[track_id] = self.now
+        if len(self.entries) > SEEN_MAX:
+            for pk, _ in sorted(self.entries.items(), key=lambda e: e[1])[:len(self.entries) - SEEN_MAX]:
+                del self.entries[pk]
+        self.changed = True
+        return True
+
+    def value(self):
+        return "|".join(f"{_b36(pk)}.{_b36(ts)}" for pk, ts in self.entries.items())
+
+    def set_cookie(self, response):
+        response.set_signed_cookie(
+            self.name, self.value(), salt=COOKIE_SALT,
+            max_age=VIEW_COOLDOWN, httponly=True, samesite="Lax",
+        )
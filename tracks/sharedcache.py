@@ -0,0 +1,172 @@
+"""
+Спільний для всіх воркерів стан: cache backend у SQLite-файлі.
+
+LocMemCache у кожного процесу свій (і витісняє ключі після MAX_ENTRIES), тож
+версія каталогу, lock на перемальовування чи буфер лічильників у ньому не
+бачать інші воркери і manage.py-команди. Тут — окремий SQLite-файл через stdlib
+sqlite3, як у tracks/ratelimit.py: add / incr атомарні між процесами (BEGIN
+IMMEDIATE), читання — один пошук по первинному ключу в WAL.
+
+MAX_ENTRIES витісняє лише записи з таймаутом: ключі з timeout=None (версії,
+лічильники) не зникають ніколи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BUSY_TIMEOUT = 5  # сек — скільки чекати на блокування файлу іншим процесом
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+"""
+
+_local = threading.local()
+
+
+def connect(path, schema):
+    """Окреме з'єднання на потік, процес і файл (після fork старе не використовуємо)."""
+    path = str(path)
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid, _local.conns = os.getpid(), {}
+    conn = _local.conns.get((path, schema))
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(schema)
+        _local.conns[(path, schema)] = conn
+    return conn
+
+
+@contextmanager
+def immediate(conn):
+    """Транзакція з блокуванням на запис одразу — атомарно між процесами."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _encode(value):
+    # цілі — як є, щоб incr рахувався в SQL; решта — pickle
+    return value if type(value) is int else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+
+    def _conn(self):
+        return connect(self._path, SCHEMA)
+
+    def _cull(self, conn):
+        if conn.execute("SELECT count(*) FROM cache").fetchone()[0] <= self._max_entries:
+            return
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        excess = conn.execute("SELECT count(*) FROM cache").fetchone()[0] - self._max_entries
+        if excess > 0:
+            # як у Django: прибираємо частку найстаріших, але лише тих, що й так протухнуть
+            limit = max(excess, self._max_entries // (self._cull_frequency or 1))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache WHERE expires IS NOT NULL ORDER BY expires LIMIT ?)",
+                (limit,),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        names = {self.make_and_validate_key(k, version=version): k for k in keys}
+        if not names:
+            return {}
+        rows = self._conn().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({', '.join('?' * len(names))})"
+            " AND (expires IS NULL OR expires > ?)",
+            (*names, time.time()),
+        ).fetchall()
+        return {names[key]: _decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._conn().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with immediate(self._conn()) as conn:
+            conn.execute(
+                "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                (key, _encode(value), self.get_backend_timeout(timeout)),
+            )
+            self._cull(conn)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with immediate(self._conn()) as conn:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, time.time()))
+            added = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, _encode(value), self.get_backend_timeout(timeout)),
+            ).rowcount == 1
+            if added:
+                self._cull(conn)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with immediate(self._conn()) as conn:
+            return conn.execute(
+                "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with immediate(self._conn()) as conn:
+            updated = conn.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? AND typeof(value) = 'integer'"
+                " AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time()),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            return conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._conn().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        names = [self.make_and_validate_key(k, version=version) for k in keys]
+        if names:
+            self._conn().execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(names))})", names)
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, stats
+from .genres import bump_genre_version
+from .models import COUNTER_FIELDS, Genre, Inquiry, RelatedTrack, Track, recount_genre_tracks
+from .pagecache import bump_catalog_version
+from .related import refresh_for as refresh_related
+
+# поля треку, що потрапляють у пошуковий індекс (жанри — через m2m_changed)
+SEARCH_FIELDS = {"title", "description"}
+
+
+@receiver(post_save, sender=Track)
+@receiver(post_save, sender=Genre)
+def catalog_saved(sender, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields and set(update_fields) <= COUNTER_FIELDS):
+        return
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Track)
+@receiver(post_delete, sender=Genre)
+def catalog_deleted(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed(sender, raw=False, **kwargs):
+    if not raw:
+        bump_genre_version()
+
+
+@receiver(post_save, sender=Track)
+def track_search_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields and not set(update_fields) & SEARCH_FIELDS):
+        return
+    search.index_tracks([instance.pk])
+
+
+@receiver(post_save, sender=Genre)
+def genre_search_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        search.index_genre(instance.pk)  # назва жанру — у рядку кожного його треку
+        instance.tracks.update(updated_at=timezone.now())  # і на картці кожного (кеш фрагментів)
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleting(sender, instance, **kwargs):
+    instance._search_track_ids = list(instance.tracks.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    track_ids = getattr(instance, "_search_track_ids", [])
+    search.index_tracks(track_ids)
+    Track.objects.filter(pk__in=track_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Inquiry)
+def inquiry_stats_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_inquiry(instance)
+
+
+@receiver(m2m_changed, sender=Track.genres.through)
+def track_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # після clear вже не дізнаємось, які жанри були
+        if reverse:
+            instance._cleared_genre_ids = [instance.pk]
+            instance._cleared_track_ids = list(instance.tracks.values_list("pk", flat=True))
+        else:
+            instance._cleared_genre_ids = list(instance.genres.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_clear":
+        genre_ids = getattr(instance, "_cleared_genre_ids", [])
+    elif reverse:
+        genre_ids = [instance.pk]  # genre.tracks.add(...)
+    else:
+        genre_ids = pk_set or []
+    if genre_ids:
+        recount_genre_tracks(genre_ids)
+        bump_genre_version()
+    bump_catalog_version()
+
+    track_ids = (pk_set or []) if reverse else [instance.pk]
+    if reverse and action == "post_clear":
+        track_ids = getattr(instance, "_cleared_track_ids", [])
+    if track_ids:
+        # жанри — частина картки треку: нова версія → новий ключ кешу фрагмента
+        Track.objects.filter(pk__in=track_ids).update(updated_at=timezone.now())
+        search.index_tracks(track_ids)
+        _schedule_related_refresh(track_ids)
+
+
+def _schedule_related_refresh(track_ids):
+    track_ids = list(track_ids)
+
+    def run():
+        refresh_related(track_ids)
+        bump_catalog_version()  # сторінки могли закешуватись зі старими «схожими»
+
+    transaction.on_commit(run)
+
+
+@receiver(pre_delete, sender=Track)
+def track_deleting(sender, instance, **kwargs):
+    # рядки through-таблиці зникнуть каскадом, без m2m_changed
+    instance._deleted_genre_ids = list(instance.genres.values_list("pk", flat=True))
+    # ті, у кого він був серед «схожих», втратять рядок — перерахуємо їх після видалення
+    instance._related_holders = list(
+        RelatedTrack.objects.filter(related=instance).values_list("track_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Track)
+def track_deleted(sender, instance, **kwargs):
+    genre_ids = getattr(instance, "_deleted_genre_ids", [])
+    if genre_ids:
+        recount_genre_tracks(genre_ids)
+        bump_genre_version()
+    search.remove_tracks([instance.pk])
+    holders = getattr(instance, "_related_holders", [])
+    if holders:
+        _schedule_related_refresh(holders)
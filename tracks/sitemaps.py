@@ -1,15 +1,105 @@
-from django.contrib.sitemaps import Sitemap
+"""
+Sitemap index + частини по SITEMAP_CHUNK треків.
 
+Трек потрапляє в частину за pk (pk // SITEMAP_CHUNK), а не за зсувом — тож
+новий чи видалений трек не зсуває решту, і lastmod інших частин не змінюється:
+краулер перекачує лише ті, що справді оновились. Кожен документ кешується
+до зміни каталогу (versioned_page_cache), а If-None-Match / If-Modified-Since
+від краулера отримують 304 без рендеру і без запитів (conditional_page).
+"""
+from xml.sax.saxutils import escape
+
+from django.db.models import F, Max
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+
+from .genres import registry as genre_registry
 from .models import Track
+from .pagecache import conditional_page, versioned_page_cache
+
+SITEMAP_CHUNK = 10000  # протокол дозволяє до 50 000 URL на файл
+CONTENT_TYPE = "application/xml; charset=utf-8"
+XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def _w3c(dt):
+    return dt.isoformat(timespec="seconds") if dt else None
+
+
+def _entry(tag, loc, lastmod=None, extra=""):
+    lastmod = f"<lastmod>{_w3c(lastmod)}</lastmod>" if lastmod else ""
+    return f"<{tag}><loc>{escape(loc)}</loc>{lastmod}{extra}</{tag}>\n"
+
+
+def _document(root, entries):
+    return HttpResponse(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<{root} {XMLNS}>\n{"".join(entries)}</{root}>\n',
+        content_type=CONTENT_TYPE,
+    )
+
+
+def track_chunks():
+    """[(номер частини, найсвіжіший updated_at)] — один GROUP BY."""
+    return list(
+        Track.objects.annotate(chunk=F("pk") / SITEMAP_CHUNK)
+        .values_list("chunk")
+        .annotate(lastmod=Max("updated_at"))
+        .order_by("chunk")
+    )
+
+
+@conditional_page()
+@versioned_page_cache()
+def sitemap_index(request):
+    chunks = track_chunks()
+    latest = max((lastmod for _, lastmod in chunks), default=None)
+    entries = [_entry("sitemap", request.build_absolute_uri(reverse("sitemap_pages")), latest)]
+    entries += [
+        _entry("sitemap", request.build_absolute_uri(reverse("sitemap_tracks", args=[chunk])), lastmod)
+        for chunk, lastmod in chunks
+    ]
+    return _document("sitemapindex", entries)
 
 
-class TrackSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.7
+@conditional_page()
+@versioned_page_cache()
+def sitemap_tracks(request, chunk):
+    start = chunk * SITEMAP_CHUNK
+    rows = (
+        Track.objects.filter(pk__gte=start, pk__lt=start + SITEMAP_CHUNK)
+        .order_by("pk")
+        .values_list("slug", "updated_at")
+        .iterator(chunk_size=2000)
+    )
+    base = request.build_absolute_uri("/")[:-1]
+    entries = [
+        _entry("url", f"{base}/track/{slug}/", updated_at, "<changefreq>weekly</changefreq><priority>0.7</priority>")
+        for slug, updated_at in rows
+    ]
+    if not entries:
+        raise Http404("Порожня частина sitemap")
+    return _document("urlset", entries)
 
-    def items(self):
-        return Track.objects.all()
 
-    def location(self, obj):
-        # якщо вже є get_absolute_url у моделі — можна лишити тільки return obj
-        return f"/track/{obj.slug}/"
+@conditional_page()
+@versioned_page_cache()
+def sitemap_pages(request):
+    """Головна, каталог, «як це працює» і сторінки жанрів /catalog/?genre=."""
+    latest = Track.objects.aggregate(latest=Max("updated_at"))["latest"]
+    by_genre = dict(
+        Track.genres.through.objects.values_list("genre_id")
+        .annotate(lastmod=Max("track__updated_at"))
+        .order_by()
+    )
+    base = request.build_absolute_uri("/")[:-1]
+    entries = [
+        _entry("url", base + reverse("home"), latest, "<changefreq>daily</changefreq>"),
+        _entry("url", base + reverse("catalog"), latest, "<changefreq>daily</changefreq>"),
+        _entry("url", base + reverse("how_it_works")),
+    ]
+    entries += [
+        _entry("url", f"{base}{reverse('catalog')}?genre={g.slug}", by_genre.get(g.pk),
+               "<changefreq>weekly</changefreq><priority>0.5</priority>")
+        for g in genre_registry.used()
+    ]
+    return _document("urlset", entries)
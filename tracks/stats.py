@@ -0,0 +1,138 @@
+"""
+Денна статистика треків (TrackDailyStat): перегляди, кліки «Замовити» і заявки
+за типом ліцензії — рядок на трек на день.
+
+Лічильники потрапляють сюди разом із флашем tracks.counters (ті ж дельти, та ж
+транзакція), заявки — з post_save Inquiry (tracks/signals.py). Кожен інкремент —
+upsert (INSERT ... ON CONFLICT DO UPDATE): без читання рядка і без гонки
+«два воркери створюють один день». Старі дні compact() згортає в місячні рядки,
+тож таблиця росте з кількістю треків, а не з історією. Звіт в адмінці читає
+лише її — Inquiry і Track.view_count не сканує.
+"""
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Inquiry, TrackDailyStat
+
+FIELDS = (
+    "views",
+    "order_clicks",
+    "inquiries_nonexclusive",
+    "inquiries_exclusive",
+    "inquiries_exclusive_stems",
+)
+
+# поля tracks.counters → колонки статистики
+COUNTER_COLUMNS = {"view_count": "views", "order_clicks": "order_clicks"}
+
+LICENSE_COLUMNS = {
+    "nonexclusive": "inquiries_nonexclusive",
+    "non_exclusive": "inquiries_nonexclusive",  # дефолт Inquiry.license_type пишеться з підкресленням
+    "exclusive": "inquiries_exclusive",
+    "exclusive_stems": "inquiries_exclusive_stems",
+}
+
+
+def _upsert_sql():
+    q = connection.ops.quote_name
+    table = q(TrackDailyStat._meta.db_table)
+    columns = ["track_id", "day", "period", *FIELDS]
+    updates = ", ".join(f"{q(f)} = {table}.{q(f)} + excluded.{q(f)}" for f in FIELDS)
+    return (
+        f"INSERT INTO {table} ({', '.join(q(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({q('track_id')}, {q('day')}, {q('period')}) DO UPDATE SET {updates}"
+    )
+
+
+def upsert(rows, day=None, period="d"):
+    """
+    Додає інкременти {track_id: {колонка: n}} до рядків (трек, day, period) —
+    одним executemany. day за замовчуванням — сьогодні (локальна дата).
+    """
+    if not rows:
+        return
+    day = connection.ops.adapt_datefield_value(day or timezone.localdate())
+    params = [
+        (track_id, day, period, *(int(values.get(f, 0)) for f in FIELDS))
+        for track_id, values in rows.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(), params)
+
+
+def record_counts(deltas, day=None):
+    """Дельти флашу лічильників: {track_id: {"view_count": n, "order_clicks": m}}."""
+    upsert({
+        pk: {COUNTER_COLUMNS[field]: n for field, n in fields.items() if field in COUNTER_COLUMNS}
+        for pk, fields in deltas.items()
+    }, day=day)
+
+
+def record_inquiry(inquiry):
+    column = LICENSE_COLUMNS.get(inquiry.license_type)
+    if inquiry.track_id is None or column is None:
+        return  # заявка на кастом — не про жоден трек
+    day = timezone.localdate(inquiry.created_at) if inquiry.created_at else None
+    upsert({inquiry.track_id: {column: 1}}, day=day)
+
+
+def compact(before):
+    """
+    Згортає денні рядки з day < before у місячні (day — перше число місяця).
+    Одна транзакція; повертає кількість прибраних денних рядків.
+    """
+    daily = TrackDailyStat.objects.filter(period="d", day__lt=before)
+    with transaction.atomic():
+        months = {}
+        for row in (daily.annotate(month=TruncMonth("day"))
+                    .values("track_id", "month")
+                    .annotate(**{f: Sum(f) for f in FIELDS})
+                    .order_by()):
+            months.setdefault(row["month"], {})[row["track_id"]] = {f: row[f] for f in FIELDS}
+        for month, rows in months.items():
+            upsert(rows, day=month, period="m")
+        return daily.delete()[0]
+
+
+def report(since, top=20):
+    """
+    Дані для звіту в адмінці з дня since: підсумки, по днях, топ треків і
+    конверсія кліків у заявки за ліцензіями. Місячні рядки враховуються, якщо
+    місяць починається не раніше since (compact_stats згортає лише цілі місяці).
+    """
+    sums = {f: Sum(f) for f in FIELDS}
+    rows = TrackDailyStat.objects.filter(day__gte=since)
+
+    totals = {f: n or 0 for f, n in rows.aggregate(**sums).items()}
+    daily = list(rows.filter(period="d").values("day").annotate(**sums).order_by("-day"))
+    top_tracks = list(
+        rows.values("track_id", "track__title", "track__slug")
+        .annotate(**sums)
+        .order_by("-views", "-order_clicks")[:top]
+    )
+
+    inquiries = sum(totals[f] for f in FIELDS[2:])
+    licenses = []
+    for code, label in Inquiry.LICENSE_CHOICES:
+        n = totals[LICENSE_COLUMNS[code]]
+        licenses.append({
+            "code": code,
+            "label": label.split(" — ")[0],
+            "count": n,
+            "share": n / inquiries if inquiries else 0.0,
+            "per_click": n / totals["order_clicks"] if totals["order_clicks"] else 0.0,
+        })
+    for row in top_tracks:
+        row["inquiries"] = sum(row[f] for f in FIELDS[2:])
+
+    return {
+        "since": since,
+        "totals": totals,
+        "inquiries": inquiries,
+        "daily": daily,
+        "top_tracks": top_tracks,
+        "licenses": licenses,
+    }
@@ -0,0 +1,20 @@
+# tracks/templatetags/youtube.py
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("tracks/_youtube_facade.html")
+def youtube_facade(track, playable=True):
+    """
+    Легка «обгортка» замість iframe: превʼю з i.ytimg.com (lazy) і кнопка ▶,
+    справжній плеєр (youtube-nocookie) підставляє скрипт лише після кліку.
+    playable=False — лише превʼю (напр. всередині посилання на трек).
+    Приклад: {% youtube_facade track %} … {% youtube_facade_script %} перед </body>
+    """
+    return {"track": track, "playable": playable}
+
+
+@register.inclusion_tag("tracks/_youtube_facade_script.html")
+def youtube_facade_script():
+    return {}
@@ -1,3 +1,1256 @@
-from django.test import TestCase
+import gzip
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import counters, facets, forms, models, notify, pagecache, perf, ratelimit, related, search, seen, stats, views
+from .genres import bump_genre_version, registry as genre_registry
+from .fake_telegram import FakeTelegramServer
+from .models import Genre, OutboxMessage, RelatedTrack, Track, extract_youtube_id
+
+_shared_state = {}
+
+
+def setUpModule():
+    # спільний стан воркерів і rate limit — у тимчасових файлах, а не у файлах проєкту
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "shared.sqlite3")
+    patcher = override_settings(
+        SHARED_STATE_DB=path,
+        RATELIMIT_DB=os.path.join(tmp.name, "ratelimit.sqlite3"),
+        COUNTER_FLUSH_THREAD=False,  # флаш — у тому ж потоці, в транзакції тесту
+        CACHES={**settings.CACHES, "shared": {**settings.CACHES["shared"], "LOCATION": path}},
+    )
+    patcher.enable()
+    _shared_state.update(tmp=tmp, patcher=patcher)
+
+
+def tearDownModule():
+    _shared_state["patcher"].disable()
+    _shared_state["tmp"].cleanup()
+
+
+def clear_caches():
+    cache.clear()
+    caches["shared"].clear()
+    pagecache.reset_stats()
+    buffer = counters._buffer()  # БД між тестами відкочується, буфер — ні
+    buffer.execute("DELETE FROM counter_buffer")
+    buffer.execute("UPDATE counter_meta SET pending = 0, last_flush = ?", (time.time(),))
+
+
+class YoutubeIdTests(TestCase):
+    def test_extract_youtube_id_variants(self):
+        vid = "OfTm9MIVhqU"
+        urls = [
+            f"https://youtu.be/{vid}",
+            f"https://youtu.be/{vid}?t=42",
+            f"https://www.youtube.com/watch?v={vid}",
+            f"https://www.youtube.com/watch?v={vid}&t=1m5s",
+            f"https://m.youtube.com/watch?feature=share&v={vid}",
+            f"https://music.youtube.com/watch?v={vid}&list=RD",
+            f"https://www.youtube.com/shorts/{vid}",
+            f"https://www.youtube.com/embed/{vid}?start=10",
+            f"https://www.youtube-nocookie.com/embed/{vid}",
+        ]
+        for url in urls:
+            self.assertEqual(extract_youtube_id(url), vid, url)
+
+    def test_extract_youtube_id_rejects_garbage(self):
+        for url in ["", "https://vimeo.com/123", "https://youtube.com/watch", "https://youtu.be/short"]:
+            self.assertIsNone(extract_youtube_id(url), url)
+
+    def test_save_fills_video_id_and_urls(self):
+        t = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU?t=3")
+        self.assertEqual(t.video_id, "OfTm9MIVhqU")
+        self.assertEqual(t.embed_url, "https://www.youtube-nocookie.com/embed/OfTm9MIVhqU")
+        self.assertEqual(t.thumbnail_url, "https://i.ytimg.com/vi/OfTm9MIVhqU/hqdefault.jpg")
+
+    def test_clean_rejects_duplicate_video(self):
+        Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+        dup = Track(title="Beat 2", youtube_url="https://www.youtube.com/watch?v=OfTm9MIVhqU")
+        with self.assertRaises(ValidationError):
+            dup.clean()
+
+
+@override_settings(COUNTER_FLUSH_THRESHOLD=1000, COUNTER_FLUSH_INTERVAL=3600)
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+
+    def _track_updates(self, queries):
+        return [q for q in queries if q["sql"].startswith('UPDATE "tracks_track"')]
+
+    def test_views_are_buffered_and_flushed_in_one_write(self):
+        url = self.track.get_absolute_url()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(10):
+                self.assertEqual(Client().get(url).status_code, 200)
+        self.assertEqual(self._track_updates(ctx.captured_queries), [])
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 10)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("flush_counters", stdout=StringIO())
+        self.assertEqual(len(self._track_updates(ctx.captured_queries)), 1)
+
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.view_count, 10)
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 0)
+
+    def test_buffer_is_shared_and_survives_cache_churn(self):
+        make_tracks(20)
+        counters.record_view(self.track.pk)
+        for i in range(6000):  # LocMem витісняє старі ключі — буфер живе не там
+            cache.set(f"junk:{i}", i)
+        with multiprocessing.get_context("fork").Pool(1) as pool:  # як manage.py flush_counters з cron
+            self.assertEqual(pool.apply(counters.pending_for, (self.track.pk,))["view_count"], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(counters.flush(), 1)
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        self.assertIn(f"IN ({self.track.pk})", selects[0])  # лише брудні треки, не весь каталог
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.view_count, 1)
+
+    def test_threshold_triggers_flush(self):
+        with self.settings(COUNTER_FLUSH_THRESHOLD=3):
+            for _ in range(4):
+                counters.record_view(self.track.pk)
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.view_count, 3)
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 1)
+
+    def test_event_is_one_write_and_flush_leaves_the_request(self):
+        from . import sharedcache
+
+        real = sharedcache.immediate
+        with mock.patch("tracks.sharedcache.immediate", wraps=real) as cache_writes, \
+                mock.patch("tracks.counters.immediate", wraps=real) as buffer_writes:
+            counters.record_view(self.track.pk)
+        self.assertEqual(cache_writes.call_count + buffer_writes.call_count, 1)  # буфер і pending — одна транзакція
+
+        with self.settings(COUNTER_FLUSH_THRESHOLD=2, COUNTER_FLUSH_THREAD=True), \
+                mock.patch.object(counters.flusher, "wake") as wake:
+            counters.record_view(self.track.pk)
+        wake.assert_called_once()
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.view_count, 0)  # у запиті нічого не злито
+
+        counters.flush()
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.view_count, 2)
+        self.assertEqual(counters._buffer().execute("SELECT pending FROM counter_meta").fetchone(), (0,))
+
+    def test_order_click_endpoint(self):
+        url = f"/track/{self.track.pk}/order-click/"
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self.client.post(url).status_code, 204)  # та сама кукі — вдруге не рахуємо
+        self.assertEqual(self.client.post("/track/999999/order-click/").status_code, 404)
+        counters.flush()
+        self.track.refresh_from_db()
+        self.assertEqual(self.track.order_clicks, 1)
+
+    def test_order_click_is_rate_limited(self):
+        url = f"/track/{self.track.pk}/order-click/"
+        codes = [Client().post(url, REMOTE_ADDR="198.51.100.3").status_code for _ in range(31)]
+        self.assertEqual(codes.count(204), 30)
+        self.assertEqual(codes[-1], 429)
+        self.assertEqual(counters.pending_for(self.track.pk)["order_clicks"], 30)
+
+
+class TelegramOutboxTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.server = FakeTelegramServer().start()
+        self.addCleanup(self.server.stop)
+        patcher = self.settings(
+            TELEGRAM_BOT_TOKEN="123:abc",
+            TELEGRAM_CHAT_ID="42",
+            TELEGRAM_API_URL=self.server.url,
+            TELEGRAM_SENDER_THREAD=False,
+            TELEGRAM_RETRY_BASE=5,
+            RATELIMIT_ENABLED=False,
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_order_post_only_enqueues(self):
+        track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+        resp = self.client.post("/order/", {
+            "name": "Ivan", "contact": "@ivan_beats", "license_type": "exclusive", "track": track.pk,
+            "started": forms.make_started_token(time.time() - 10),
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(OutboxMessage.objects.filter(status="pending").count(), 1)
+        self.assertEqual(self.server.messages, [])
+
+    def test_burst_is_merged_and_retried_with_backoff(self):
+        self.server.fail_first = 1
+        for i in range(3):
+            notify.enqueue_telegram(f"заявка {i}")
+
+        with self.assertLogs("tracks.notify", "WARNING"):
+            self.assertEqual(notify.deliver_pending(), 0)
+        msgs = OutboxMessage.objects.all()
+        self.assertTrue(all(m.attempts == 1 and m.status == "pending" for m in msgs))
+        # до кінця backoff нічого не відправляємо
+        self.assertEqual(notify.deliver_pending(), 0)
+
+        later = timezone.now() + timedelta(seconds=10)
+        self.assertEqual(notify.deliver_pending(now=later), 3)
+        self.assertEqual(len(self.server.messages), 1)
+        text = self.server.messages[0]["text"]
+        self.assertTrue(all(f"заявка {i}" in text for i in range(3)))
+        self.assertEqual(OutboxMessage.objects.filter(status="sent").count(), 3)
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.fail_first = 100
+        notify.enqueue_telegram("x")
+        with self.settings(TELEGRAM_MAX_ATTEMPTS=2), self.assertLogs("tracks.notify", "WARNING"):
+            notify.deliver_pending()
+            notify.deliver_pending(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(OutboxMessage.objects.get().status, "failed")
+
+    def test_merge_texts_respects_limit(self):
+        chunks = notify.merge_texts(["a" * 30, "b" * 30, "c" * 30], limit=70)
+        self.assertEqual([idx for idx, _ in chunks], [[0, 1], [2]])
+        self.assertTrue(all(len(text) <= 70 for _, text in chunks))
+
+
+class GenreSyncTests(TestCase):
+    def _create(self, n_tags, url="https://youtu.be/OfTm9MIVhqU"):
+        tags = ", ".join(f"Tag {i}" for i in range(n_tags))
+        return Track.objects.create(title=f"Beat {n_tags}", youtube_url=url, description=tags)
+
+    def test_query_count_does_not_depend_on_tag_count(self):
+        with CaptureQueriesContext(connection) as few:
+            self._create(2)
+        with CaptureQueriesContext(connection) as many:
+            self._create(10, url="https://youtu.be/r-xwP7H6c0U")
+        self.assertEqual(len(few), len(many))
+        self.assertLessEqual(len(many), 16)  # разом з оновленням пошукового індексу
+        self.assertEqual(Genre.objects.count(), 10)
+
+    def test_diff_and_rename(self):
+        t = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU",
+                                 description="trap, Dark, female")
+        t = Track.objects.get(pk=t.pk)
+        t.description = "Trap, dark, drill"
+        t.save()
+        self.assertEqual(sorted(g.name for g in t.genres.all()), ["Trap", "dark", "drill"])
+        self.assertFalse(Genre.objects.get(slug="female").tracks.exists())
+
+    def test_unchanged_description_skips_sync(self):
+        t = self._create(5)
+        t = Track.objects.get(pk=t.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            t.title = "Other"
+            t.save()
+            t.save(update_fields=["is_featured"])
+        self.assertEqual(len(ctx), 4)  # 2 UPDATE + DELETE/INSERT назви в пошуковий індекс
+
+
+class SlugAllocationTests(TestCase):
+    def _track(self, n, title="Type Beat"):
+        return Track.objects.create(title=title, youtube_url=f"https://youtu.be/OfTm9MIVh{n:02d}")
+
+    def test_next_free_slug(self):
+        self.assertEqual(models.next_free_slug("beat", []), "beat")
+        self.assertEqual(models.next_free_slug("beat", ["beat"]), "beat-2")
+        self.assertEqual(models.next_free_slug("beat", ["beat", "beat-2", "beat-7", "beat-maker", "beat-x-3"]), "beat-8")
+
+    def test_collisions_cost_one_query(self):
+        for n in range(5):
+            self._track(n)
+        with CaptureQueriesContext(connection) as ctx:
+            t = self._track(5)
+        self.assertEqual(t.slug, "type-beat-6")
+        self.assertEqual(sum('"slug"' in q["sql"] and "LIKE" in q["sql"] for q in ctx.captured_queries), 1)
+
+    def test_only_base_and_suffixed_slugs_are_read(self):
+        self._track(0, title="A")
+        self._track(1, title="Alpha")
+        self._track(2, title="A")
+        with mock.patch.object(models, "next_free_slug", wraps=models.next_free_slug) as m:
+            self.assertEqual(models.unique_slug(Track, "a"), "a-3")
+        self.assertEqual(sorted(m.call_args.args[1]), ["a", "a-2"])  # «alpha» не тягнемо
+
+    def test_retries_when_slug_is_taken_concurrently(self):
+        self._track(0)
+        # перша спроба отримує slug, який «паралельно» вже зайняли
+        with mock.patch.object(models, "unique_slug", side_effect=["type-beat", "type-beat-2"]) as m:
+            t = self._track(1)
+        self.assertEqual(t.slug, "type-beat-2")
+        self.assertEqual(m.call_count, 2)
+
+    def test_genre_slug_is_deduplicated(self):
+        Genre.objects.create(name="Lo-Fi", slug="lo-fi")
+        self.assertEqual(Genre.objects.create(name="Lo Fi").slug, "lo-fi-2")
+
+
+class ImportExportTests(TestCase):
+    def _jsonl(self, rows):
+        f = tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8")
+        self.addCleanup(os.unlink, f.name)
+        with f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return f.name
+
+    def _rows(self, n, suffix=""):
+        return [
+            {"title": "Type Beat", "youtube_url": f"https://youtu.be/OfTm9MIV{i:03d}",
+             "description": f"trap, dark{suffix}, tag {i % 3}", "is_featured": i == 0}
+            for i in range(n)
+        ]
+
+    def _import(self, path, *args):
+        out = StringIO()
+        call_command("import_tracks", path, "--batch-size", "4", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_import_creates_tracks_slugs_and_genres(self):
+        path = self._jsonl(self._rows(10) + [{"title": "bad", "youtube_url": "https://vimeo.com/1"}])
+        out = self._import(path)
+        self.assertIn("створено 10", out)
+        self.assertIn("пропущено 1", out)
+        slugs = set(Track.objects.values_list("slug", flat=True))
+        self.assertEqual(slugs, {"type-beat"} | {f"type-beat-{i}" for i in range(2, 11)})
+        self.assertEqual(Genre.objects.get(slug="trap").tracks.count(), 10)
+        self.assertEqual(Genre.objects.get(slug="tag-1").tracks.count(), 3)
+        self.assertTrue(Track.objects.get(youtube_url__endswith="000").is_featured)
+
+    def test_overlapping_slug_bases_in_one_batch(self):
+        rows = [
+            {"title": title, "youtube_url": f"https://youtu.be/OfTm9MIV{i:03d}"}
+            for i, title in enumerate(["Beat", "Beat", "Beat 2"])  # друга «Beat» займає «beat-2» — базу третьої
+        ]
+        self.assertIn("створено 3", self._import(self._jsonl(rows)))
+        self.assertEqual(sorted(Track.objects.values_list("slug", flat=True)), ["beat", "beat-2", "beat-2-2"])
+
+    def test_dry_run_writes_nothing(self):
+        out = self._import(self._jsonl(self._rows(5)), "--dry-run")
+        self.assertIn("[dry-run] створено 5", out)
+        self.assertFalse(Track.objects.exists())
+
+    def test_failed_batch_keeps_earlier_batches(self):
+        from tracks.management.commands import import_tracks
+
+        real, calls = import_tracks.import_batch, []
+
+        def flaky(batch, stats, upsert=True):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise RuntimeError("boom")
+            return real(batch, stats, upsert=upsert)
+
+        with mock.patch.object(import_tracks, "import_batch", side_effect=flaky), self.assertRaises(RuntimeError):
+            self._import(self._jsonl(self._rows(10)))
+        self.assertEqual(Track.objects.count(), 4)  # перша пачка закомічена окремо
+
+    def test_upsert_by_youtube_url(self):
+        self._import(self._jsonl(self._rows(5)))
+        out = self._import(self._jsonl(self._rows(5, suffix="er")))
+        self.assertIn("оновлено 5", out)
+        self.assertEqual(Track.objects.count(), 5)
+        self.assertFalse(Genre.objects.get(slug="dark").tracks.exists())
+        self.assertEqual(Genre.objects.get(slug="darker").tracks.count(), 5)
+
+    def test_export_round_trip(self):
+        self._import(self._jsonl(self._rows(3)))
+        out = StringIO()
+        call_command("export_tracks", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["slug"] for r in rows], ["type-beat", "type-beat-2", "type-beat-3"])
+        self.assertIn("created_at", rows[0])
+
+
+def make_tracks(n, genre=None, featured_every=7):
+    """Швидко насипати n треків (bulk_create, без сигналів)."""
+    tracks = Track.objects.bulk_create([
+        Track(title=f"Beat {i}", slug=f"beat-{i}", youtube_url=f"https://youtu.be/Bt{i:09d}",
+              video_id=f"Bt{i:09d}", is_featured=(i % featured_every == 0))
+        for i in range(n)
+    ])
+    if genre is not None:
+        genre.tracks.add(*tracks[::2])
+    return tracks
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.genre = Genre.objects.create(name="Trap", slug="trap")
+        make_tracks(50, genre=self.genre)
+        self.expected = list(
+            Track.objects.order_by("-is_featured", "-created_at", "id").values_list("pk", flat=True)
+        )
+
+    def _page(self, query=""):
+        resp = self.client.get(f"/catalog/{query}")
+        self.assertEqual(resp.status_code, 200)
+        return resp.context["page_obj"]
+
+    def test_walks_forward_and_back_without_gaps(self):
+        page = self._page()
+        seen, pages = list(page.object_list), [page]
+        while page.has_next:
+            page = self._page(f"?cursor={page.next_cursor}")
+            seen += page.object_list
+            pages.append(page)
+        self.assertEqual([t.pk for t in seen], self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual((pages[-1].start_index(), pages[-1].end_index(), pages[-1].count), (43, 50, 50))
+
+        back = self._page(f"?cursor={pages[-1].previous_cursor}")
+        self.assertEqual([t.pk for t in back], [t.pk for t in pages[1]])
+        self.assertEqual(back.start_index(), 22)
+
+    def test_no_offset_or_count_on_cursor_pages(self):
+        first = self._page()
+        with CaptureQueriesContext(connection) as ctx:
+            self._page(f"?cursor={first.next_cursor}")
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    def test_legacy_page_and_last_cursor(self):
+        page2 = self._page("?page=2")
+        self.assertEqual([t.pk for t in page2], self.expected[21:42])
+        self.assertEqual([t.pk for t in self._page("?page=999")], self.expected[42:])
+        last = self._page(f"?cursor={page2.last_cursor}")
+        self.assertEqual([t.pk for t in last], self.expected[42:])
+        self.assertFalse(last.has_next)
+
+    def test_genre_filter_and_garbage_cursor(self):
+        page = self._page("?genre=trap")
+        self.assertEqual(page.count, 25)
+        self.assertEqual([t.pk for t in self._page("?cursor=%%%garbage")], self.expected[:21])
+
+    def test_tampered_cursor_key_falls_back_to_first_page(self):
+        from .pagination import encode_cursor
+
+        cursor = encode_cursor({"d": "n", "k": [True, "garbage", 1], "o": 21})
+        resp = self.client.get(f"/catalog/?cursor={cursor}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([t.pk for t in resp.context["tracks"]], self.expected[:21])
+
+
+def _bump_in_other_process(n):
+    return [pagecache.bump_catalog_version() for _ in range(n)]
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU",
+                                          description="trap")
+
+    def test_second_request_is_served_without_queries(self):
+        first = self.client.get("/catalog/")
+        self.assertEqual(first["X-Page-Cache"], "miss")
+        with self.assertNumQueries(0):
+            second = self.client.get("/catalog/?utm_source=tg")
+        self.assertEqual(second["X-Page-Cache"], "hit")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(pagecache.stats()["hit_ratio"], 0.5)
+
+    def test_hits_do_not_write_to_shared_store(self):
+        from . import sharedcache
+
+        self.client.get("/catalog/")
+        with mock.patch("tracks.sharedcache.immediate", wraps=sharedcache.immediate) as writes:
+            for _ in range(5):
+                self.assertEqual(self.client.get("/catalog/")["X-Page-Cache"], "hit")
+        self.assertEqual(writes.call_count, 0)
+        self.assertEqual(pagecache.stats()["hits"], 5)  # з пам'яті процесу
+
+    def test_save_bumps_version_and_invalidates(self):
+        self.client.get("/")
+        Track.objects.create(title="Fresh One", youtube_url="https://youtu.be/r-xwP7H6c0U")
+        resp = self.client.get("/")
+        self.assertEqual(resp["X-Page-Cache"], "miss")
+        self.assertContains(resp, "Fresh One")
+
+    def test_only_one_worker_rerenders_expired_page(self):
+        self.client.get("/catalog/")
+        pagecache.bump_catalog_version()
+        # інший воркер уже тримає lock на перемальовування
+        pagecache.shared.add(pagecache.page_cache_key(RequestFactory().get("/catalog/")) + ":lock", 1)
+        with self.assertNumQueries(0):
+            resp = self.client.get("/catalog/")
+        self.assertEqual(resp["X-Page-Cache"], "stale")
+
+    def test_detail_counts_views_on_cache_hits(self):
+        url = self.track.get_absolute_url()
+        Client().get(url)
+        resp = Client().get(url)
+        self.assertEqual(resp["X-Page-Cache"], "hit")
+        self.assertIn(seen.COOKIE_NAME, resp.cookies)
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 2)
+
+    def test_version_and_lock_are_shared_across_processes(self):
+        self.client.get("/catalog/")
+        before = pagecache.catalog_version()
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            pool.map(_bump_in_other_process, [10] * 4)  # як save в інших воркерах
+        self.assertEqual(pagecache.catalog_version(), before + 40)
+        self.assertEqual(self.client.get("/catalog/")["X-Page-Cache"], "miss")
+        self.assertEqual(pagecache.stats()["misses"], 2)
+
+    def test_version_is_bumped_again_after_commit(self):
+        before = pagecache.catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.track.title = "Renamed"
+            self.track.save()  # у транзакції: інші воркери могли встигнути закешувати старе
+            self.assertEqual(pagecache.catalog_version(), before + 1)
+        self.assertEqual(pagecache.catalog_version(), before + 2)
+
+    def test_shared_cache_culls_only_expiring_keys(self):
+        shared = caches["shared"]
+        shared._max_entries = 10
+        self.addCleanup(setattr, shared, "_max_entries", settings.CACHES["shared"]["OPTIONS"]["MAX_ENTRIES"])
+        shared.set("pinned", 1, timeout=None)
+        for i in range(30):
+            shared.set(f"page:{i}", b"x", timeout=60)
+        self.assertEqual(shared.incr("pinned"), 2)
+        self.assertIsNone(shared.get("page:0"))
+        self.assertEqual(shared.get("page:29"), b"x")
+        self.assertFalse(shared.add("pinned", 5))
+
+    def test_query_string_is_normalised(self):
+        a = self.client.get("/catalog/?genre=trap&page=1").wsgi_request
+        b = self.client.get("/catalog/?page=1&genre=trap&fbclid=x").wsgi_request
+        self.assertEqual(pagecache.page_cache_key(a), pagecache.page_cache_key(b))
+
+
+class GenreCountAndRegistryTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def _counts(self):
+        return dict(Genre.objects.values_list("slug", "track_count"))
+
+    def test_track_count_follows_m2m_changes(self):
+        a = Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap, female")
+        b = Track.objects.create(title="B", youtube_url="https://youtu.be/r-xwP7H6c0U", description="trap")
+        self.assertEqual(self._counts(), {"trap": 2, "female": 1})
+
+        b.description = "drill"
+        b.save()
+        self.assertEqual(self._counts(), {"trap": 1, "female": 1, "drill": 1})
+
+        trap = Genre.objects.get(slug="trap")
+        trap.tracks.add(b)
+        a.genres.clear()
+        self.assertEqual(self._counts(), {"trap": 1, "female": 0, "drill": 1})
+
+        b.delete()
+        self.assertEqual(self._counts(), {"trap": 0, "female": 0, "drill": 0})
+
+    def test_registry_costs_no_queries_until_genres_change(self):
+        Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap, female, dark")
+        genre_registry.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(genre_registry.get("trap").name, "trap")
+            self.assertEqual([g.slug for g in genre_registry.primary()], ["female"])
+            self.assertEqual([g.slug for g in genre_registry.other()], ["dark", "trap"])
+        Genre.objects.create(name="Empty")
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(genre_registry.get("empty"))
+        self.assertNotIn("empty", [g.slug for g in genre_registry.used()])
+
+    def test_registry_reloads_when_another_process_bumps_the_version(self):
+        Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap")
+        genre_registry.snapshot()
+        with multiprocessing.get_context("fork").Pool(1) as pool:  # напр. manage.py import_tracks
+            pool.apply(bump_genre_version)
+        with self.assertNumQueries(1):
+            genre_registry.snapshot()
+
+    def test_catalog_chips_use_registry(self):
+        Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap, female")
+        self.client.get("/catalog/")
+        pagecache.bump_catalog_version()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/catalog/?genre=trap")
+        self.assertEqual(resp.context["active_genre"].slug, "trap")
+        self.assertFalse(any('FROM "tracks_genre" ' in q["sql"] and "JOIN" not in q["sql"]
+                             for q in ctx.captured_queries))
+
+
+class RelatedTracksTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def _create(self, title, url, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Track.objects.create(title=title, youtube_url=url, description=description)
+
+    def _related(self, track):
+        return list(RelatedTrack.objects.filter(track=track).order_by("-score").values_list("related__title", flat=True))
+
+    def test_score_prefers_genre_overlap_then_recency(self):
+        now = timezone.now()
+        self.assertGreater(related.score({1, 2}, {1, 2}, now, now), related.score({1, 2}, {1, 3}, now, now))
+        self.assertGreater(related.score({1}, {1}, now, now), related.score({1}, {1}, now - timedelta(days=365), now))
+        self.assertEqual(related.score({1}, {2}, now, now), 0.0)
+
+    def test_incremental_updates_on_genre_change(self):
+        a = self._create("A", "https://youtu.be/OfTm9MIVhqU", "trap, dark")
+        b = self._create("B", "https://youtu.be/r-xwP7H6c0U", "trap, dark")
+        c = self._create("C", "https://youtu.be/dQw4w9WgXcQ", "trap")
+        self.assertEqual(self._related(a), ["B", "C"])
+        self.assertEqual(self._related(c), ["B", "A"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            b.description = "drill"
+            b.save()
+        self.assertEqual(self._related(a), ["C"])
+        self.assertEqual(self._related(b), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            c.delete()
+        self.assertEqual(self._related(a), [])
+
+    def test_rebuild_command_matches_incremental(self):
+        a = self._create("A", "https://youtu.be/OfTm9MIVhqU", "trap, dark")
+        self._create("B", "https://youtu.be/r-xwP7H6c0U", "trap")
+        before = set(RelatedTrack.objects.values_list("track_id", "related_id"))
+        RelatedTrack.objects.all().delete()
+        call_command("rebuild_related", stdout=StringIO())
+        self.assertEqual(set(RelatedTrack.objects.values_list("track_id", "related_id")), before)
+        self.assertEqual(self._related(a), ["B"])
+
+    def test_migration_backfill_matches_rebuild(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        self._create("A", "https://youtu.be/OfTm9MIVhqU", "trap, dark")
+        self._create("B", "https://youtu.be/r-xwP7H6c0U", "trap")
+        self._create("C", "https://youtu.be/dQw4w9WgXcQ", "dark, drill")
+        related.rebuild_all()
+        expected = sorted(RelatedTrack.objects.values_list("track_id", "related_id"))
+        RelatedTrack.objects.all().delete()
+        import_module("tracks.migrations.0010_relatedtrack").build_related(apps, None)
+        self.assertEqual(sorted(RelatedTrack.objects.values_list("track_id", "related_id")), expected)
+
+    def test_detail_page_reads_related_in_one_query(self):
+        a = self._create("A", "https://youtu.be/OfTm9MIVhqU", "trap")
+        self._create("B", "https://youtu.be/r-xwP7H6c0U", "trap")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(a.get_absolute_url())
+        self.assertEqual([t.title for t in resp.context["related"]], ["B"])
+        related_queries = [q for q in ctx.captured_queries if "tracks_relatedtrack" in q["sql"]]
+        self.assertEqual(len(related_queries), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.dark = Track.objects.create(title="Midnight Drive", youtube_url="https://youtu.be/OfTm9MIVhqU",
+                                         description="Темний біт, trap, female")
+        self.drill = Track.objects.create(title="Cold Streets", youtube_url="https://youtu.be/r-xwP7H6c0U",
+                                          description="drill, male")
+        self.title_hit = Track.objects.create(title="Trap Lord", youtube_url="https://youtu.be/dQw4w9WgXcQ",
+                                              description="")
+
+    def test_prefix_and_ranking(self):
+        self.assertEqual(search.ranked_ids("темн"), [self.dark.pk])
+        # збіг у назві важить більше, ніж у жанрах
+        self.assertEqual(search.ranked_ids("tra"), [self.title_hit.pk, self.dark.pk])
+        self.assertEqual(search.ranked_ids("tra", genre_id=Genre.objects.get(slug="female").pk), [self.dark.pk])
+        self.assertEqual(search.ranked_ids('"; DROP'), [])
+        self.assertEqual(search.ranked_ids("  "), [])
+
+    def test_index_follows_signals(self):
+        self.drill.title = "Warm Streets"
+        self.drill.save()
+        self.assertEqual(search.ranked_ids("warm"), [self.drill.pk])
+        self.assertEqual(search.ranked_ids("cold"), [])
+
+        self.drill.description = "boom bap"
+        self.drill.save()
+        self.assertEqual(search.ranked_ids("drill"), [])
+        self.assertEqual(search.ranked_ids("boom"), [self.drill.pk])
+
+        Genre.objects.filter(slug="boom-bap").update(name="x")  # без сигналу — rebuild має виправити
+        call_command("rebuild_search", stdout=StringIO())
+        self.assertEqual(search.ranked_ids("boom"), [self.drill.pk])
+
+        self.drill.delete()
+        self.assertEqual(search.ranked_ids("warm"), [])
+
+    def test_catalog_q_and_admin(self):
+        resp = self.client.get("/catalog/?q=trap")
+        self.assertEqual([t.pk for t in resp.context["tracks"]], [self.title_hit.pk, self.dark.pk])
+        self.assertEqual(resp.context["page_obj"].count, 2)
+        self.assertEqual(resp.context["query"], "trap")
+
+        qs, _ = admin.site._registry[Track].get_search_results(None, Track.objects.all(), "midnight")
+        self.assertEqual(list(qs), [self.dark])
+        qs, _ = admin.site._registry[Track].get_search_results(
+            None, Track.objects.all(), "https://www.youtube.com/watch?v=r-xwP7H6c0U")
+        self.assertEqual(list(qs), [self.drill])
+
+    def test_total_counts_matches_beyond_ranking_limit(self):
+        with mock.patch("tracks.search.ranked_ids.__defaults__", (None, 1)):  # limit=1
+            resp = self.client.get("/catalog/?q=trap")
+        page_obj = resp.context["page_obj"]
+        self.assertEqual(len(page_obj), 1)
+        self.assertEqual(page_obj.count, 2)  # «з 2», хоч ранжовано лише один
+        self.assertFalse(page_obj.has_next)
+        self.assertContains(resp, "показуємо 1 найрелевантніших")
+
+        resp = self.client.get("/catalog/?q=trap&genre=female&genre=trap")
+        self.assertEqual(resp.context["page_obj"].count, 1)
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_index_chunks_by_pk_and_caches(self):
+        a = Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap")
+        Track.objects.filter(pk=a.pk).update(updated_at=a.created_at - timedelta(days=3))
+        with mock.patch("tracks.sitemaps.SITEMAP_CHUNK", 1):
+            index = self.client.get("/sitemap.xml")
+            self.assertEqual(index["Content-Type"], "application/xml; charset=utf-8")
+            self.assertContains(index, f"/sitemap-tracks-{a.pk}.xml</loc><lastmod>")
+            self.assertContains(index, "/sitemap-pages.xml")
+
+            with self.assertNumQueries(1):
+                chunk = self.client.get(f"/sitemap-tracks-{a.pk}.xml")
+            self.assertContains(chunk, f"/track/{a.slug}/</loc><lastmod>{(a.created_at - timedelta(days=3)).isoformat(timespec='seconds')}")
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(f"/sitemap-tracks-{a.pk}.xml")["X-Page-Cache"], "hit")
+            self.assertEqual(self.client.get(f"/sitemap-tracks-{a.pk + 5}.xml").status_code, 404)
+
+    def test_pages_include_genres_and_updated_at_ignores_counters(self):
+        a = Track.objects.create(title="A", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap, female")
+        resp = self.client.get("/sitemap-pages.xml")
+        self.assertContains(resp, "/catalog/?genre=trap</loc>")
+        self.assertContains(resp, "/how-it-works/</loc>")
+
+        stamp = Track.objects.get(pk=a.pk).updated_at
+        a.view_count = 5
+        a.save(update_fields=["view_count"])
+        self.assertEqual(Track.objects.get(pk=a.pk).updated_at, stamp)
+        a.title = "B"
+        a.save(update_fields=["title"])
+        self.assertGreater(Track.objects.get(pk=a.pk).updated_at, stamp)
+
+
+def _hammer_ratelimit(n):
+    return sum(ratelimit.hit("hammer", 30, 3600, now=1_000_000_000 + 1800)[0] for _ in range(n))
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = self.settings(RATELIMIT_DB=os.path.join(tmp.name, "rl.sqlite3"), RATELIMIT_TRUSTED_PROXIES=["10.0.0.0/8"])
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.factory = RequestFactory()
+
+    def test_sliding_window_weights_previous_window(self):
+        start = 1_000_000_000 - 1_000_000_000 % 600
+        for _ in range(5):
+            self.assertTrue(ratelimit.hit("k", 5, 600, now=start + 10)[0])
+        allowed, _, retry_after = ratelimit.hit("k", 5, 600, now=start + 20)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0)
+        # наступне вікно: на 40% у нього попереднє ще важить 0.6 * 5 = 3 → вільно лише 2
+        later = start + 600 + 240
+        self.assertEqual([ratelimit.hit("k", 5, 600, now=later)[0] for _ in range(3)], [True, True, False])
+        self.assertTrue(ratelimit.hit("other", 5, 600, now=later)[0])
+
+    def test_client_ip_trusts_only_configured_proxies(self):
+        spoofed = self.factory.post("/", REMOTE_ADDR="203.0.113.5", HTTP_X_FORWARDED_FOR="1.2.3.4")
+        self.assertEqual(ratelimit.client_ip(spoofed), "203.0.113.5")
+        proxied = self.factory.post("/", REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR="1.2.3.4, 198.51.100.7, 10.0.0.9")
+        self.assertEqual(ratelimit.client_ip(proxied), "198.51.100.7")
+
+    def test_order_page_returns_429_with_retry_after(self):
+        codes = [self.client.post("/order/", {}, REMOTE_ADDR="198.51.100.1").status_code for _ in range(5)]
+        self.assertNotIn(429, codes)
+        resp = self.client.post("/order/", {}, REMOTE_ADDR="198.51.100.1")
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn("Retry-After", resp)
+        self.assertEqual(self.client.get("/order/", REMOTE_ADDR="198.51.100.1").status_code, 200)
+
+    async def test_async_view_shares_the_limit(self):
+        @ratelimit.ratelimit("2/m", scope="async")
+        async def view(request):
+            return views.HttpResponse("ok")
+
+        factory = AsyncRequestFactory()
+        codes = [(await view(factory.post("/", REMOTE_ADDR="198.51.100.9"))).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_limit_holds_across_processes(self):
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            allowed = sum(pool.map(_hammer_ratelimit, [25] * 4))
+        self.assertEqual(allowed, 30)
+
+
+class OrderFormTokenTests(TestCase):
+    def _post(self, **extra):
+        data = {"name": "Ivan", "contact": "@ivan_beats", "license_type": "exclusive"}
+        data.update(extra)
+        return self.client.post("/order/", data)
+
+    def setUp(self):
+        patcher = self.settings(RATELIMIT_ENABLED=False, TELEGRAM_SENDER_THREAD=False)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_get_writes_nothing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/order/?license=excl")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("sessionid", resp.cookies)
+        self.assertFalse([q for q in ctx.captured_queries if not q["sql"].startswith("SELECT")])
+        self.assertContains(resp, 'name="started"')
+
+    def test_token_age_is_checked(self):
+        self.assertContains(self._post(started=forms.make_started_token()), "блискавично")
+        self.assertContains(self._post(started="1:forged:sig"), "Форма застаріла")
+        self.assertContains(self._post(), "Форма застаріла")
+        with mock.patch("time.time", return_value=time.time() - forms.STARTED_MAX_AGE - 10):
+            expired = forms.make_started_token()
+        self.assertContains(self._post(started=expired), "Форма застаріла")
+        self.assertEqual(self._post(started=forms.make_started_token(time.time() - 10)).status_code, 302)
+        self.assertEqual(models.Inquiry.objects.count(), 1)
+
+
+class ViewDedupTests(TestCase):
+    UA = "Mozilla/5.0 (X11; Linux x86_64) Firefox/128.0"
+
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+
+    def test_repeat_view_counted_once_without_session(self):
+        url = self.track.get_absolute_url()
+        first = self.client.get(url, HTTP_USER_AGENT=self.UA)
+        self.assertIn(seen.COOKIE_NAME, first.cookies)
+        self.assertNotIn("sessionid", first.cookies)
+        second = self.client.get(url, HTTP_USER_AGENT=self.UA)
+        self.assertNotIn(seen.COOKIE_NAME, second.cookies)  # нічого не змінилось — кукі не переписуємо
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 1)
+
+        self.client.cookies[seen.COOKIE_NAME] = "1.zz:forged"
+        self.client.get(url, HTTP_USER_AGENT=self.UA)
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 2)
+
+    def test_bots_are_not_counted(self):
+        resp = self.client.get(self.track.get_absolute_url(), HTTP_USER_AGENT="Googlebot/2.1")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.cookies, {})
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 0)
+
+    def test_set_is_bounded_and_expires(self):
+        now = 1_000_000_000
+        s = seen.SeenTracks(now=now)
+        for pk in range(seen.SEEN_MAX + 10):
+            self.assertTrue(s.add(pk))
+        self.assertEqual(len(s.entries), seen.SEEN_MAX)
+        self.assertFalse(s.add(seen.SEEN_MAX + 9))
+        later = seen.SeenTracks(s.entries, now=now + seen.VIEW_COOLDOWN + 60)
+        self.assertTrue(later.add(seen.SEEN_MAX + 9))
+        self.assertLess(len(s.value()), 600)
+
+
+class ExplainPlanTests(TestCase):
+    """Головні запити сторінок мають іти по індексу: без TEMP B-TREE і без повного скану."""
+
+    def setUp(self):
+        clear_caches()
+        self.genre = Genre.objects.create(name="trap")
+        make_tracks(30, genre=self.genre)
+        models.recount_genre_tracks()
+
+    def _plans(self, fetch):
+        with CaptureQueriesContext(connection) as ctx:
+            fetch()
+        plans = {}
+        for q in ctx.captured_queries:
+            sql = q["sql"]
+            if sql.startswith("SELECT") and 'FROM "tracks_track"' in sql and "ORDER BY" in sql:
+                with connection.cursor() as cursor:
+                    cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                    plans[sql] = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(plans)
+        return plans
+
+    def assertIndexed(self, fetch):
+        for sql, plan in self._plans(fetch).items():
+            with self.subTest(sql=sql[:120]):
+                self.assertFalse([d for d in plan if "TEMP B-TREE" in d], plan)
+                self.assertFalse([d for d in plan if d.startswith("SCAN") and "INDEX" not in d], plan)
+
+    def test_public_views(self):
+        self.assertIndexed(lambda: self.client.get("/"))
+        self.assertIndexed(lambda: self.client.get("/catalog/"))
+        self.assertIndexed(lambda: views.track_list(RequestFactory().get("/")))
+        clear_caches()
+        cursor = self.client.get("/catalog/").context["page_obj"].next_cursor
+        self.assertIndexed(lambda: self.client.get(f"/catalog/?cursor={cursor}"))
+
+    def test_big_genre_uses_ordering_index(self):
+        with mock.patch("tracks.views.GENRE_EXISTS_THRESHOLD", 10):
+            self.assertIndexed(lambda: self.client.get("/catalog/?genre=trap"))
+
+    def test_small_genre_starts_from_through_table(self):
+        plans = self._plans(lambda: self.client.get("/catalog/?genre=trap"))
+        for plan in plans.values():
+            self.assertTrue(plan[0].startswith("SEARCH tracks_track_genres"), plan)
+
+    def test_admin_changelist(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "x"))
+        self.assertIndexed(lambda: self.client.get("/admin/tracks/track/"))
+
+
+class PerfMiddlewareTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        perf.histograms.reset()
+        Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap")
+
+    def test_server_timing_and_histograms(self):
+        resp = self.client.get("/catalog/")
+        timing = resp["Server-Timing"]
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$')
+        self.assertNotIn('desc="0 queries"', timing)
+        self.assertIn('desc="0 queries"', self.client.get("/catalog/")["Server-Timing"])  # з кешу сторінок
+
+        stats = perf.histograms.snapshot()["catalog"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(sum(stats["buckets"].values()), 2)
+
+    def test_slow_requests_are_logged_with_queries(self):
+        with self.settings(PERF_SLOW_MS=-1), self.assertLogs("tracks.perf", "WARNING") as logs:
+            self.client.get("/catalog/")
+        self.assertIn("tracks_track", logs.output[0])
+
+    def test_stats_endpoint_is_staff_only(self):
+        from django.contrib.auth.models import User
+
+        self.assertEqual(self.client.get("/admin/perf.json").status_code, 302)
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "x"))
+        self.client.get("/")
+        data = self.client.get("/admin/perf.json").json()
+        self.assertIn("home", data["views"])
+        self.assertEqual(data["windows"], 12)
+
+    def test_outbound_http_is_timed(self):
+        from datetime import timedelta
+        from types import SimpleNamespace
+
+        metrics = perf.Metrics()
+        token = perf._current.set(metrics)
+        try:
+            perf.http_response_hook(SimpleNamespace(elapsed=timedelta(milliseconds=120)))
+        finally:
+            perf._current.reset(token)
+        perf.http_response_hook(SimpleNamespace(elapsed=timedelta(seconds=1)))  # поза запитом — ігнор
+        self.assertEqual(metrics.http_count, 1)
+        self.assertIn('http;dur=120.0;desc="1 calls"', metrics.server_timing(0.2))
+
+    def test_template_patch_only_with_middleware(self):
+        from django.template.backends.django import Template as DjangoTemplate
+
+        self.assertIs(DjangoTemplate.render, perf._timed_render)  # поставив TracksConfig.ready()
+        with mock.patch.object(DjangoTemplate, "render", perf._original_render):
+            without = [m for m in settings.MIDDLEWARE if m != "tracks.perf.PerfMiddleware"]
+            with self.settings(MIDDLEWARE=without):
+                self.assertFalse(perf.install())
+            with self.settings(PERF_ENABLED=False):
+                self.assertFalse(perf.install())
+            self.assertIs(DjangoTemplate.render, perf._original_render)
+
+
+@override_settings(RATELIMIT_ENABLED=False, TELEGRAM_BOT_TOKEN="t", TELEGRAM_CHAT_ID="1", TELEGRAM_SENDER_THREAD=False)
+class AsyncViewsTests(TestCase):
+    """async-версії під ASGI: жодного SynchronousOnlyOperation і той самий результат, що й у sync."""
+
+    UA = "Mozilla/5.0 (X11; Linux x86_64) Firefox/128.0"
+
+    def setUp(self):
+        clear_caches()
+        self.factory = AsyncRequestFactory()
+        trap = Genre.objects.create(name="trap", slug="trap")
+        self.track = Track.objects.create(title="Night Drive", youtube_url="https://youtu.be/OfTm9MIVhqU",
+                                          description="trap", is_featured=True)
+        self.track.genres.add(trap)
+
+    async def test_read_views_render_same_html(self):
+        for path, view in (("/", views.ahome), ("/catalog/?genre=trap", views.acatalog)):
+            resp = await view(self.factory.get(path))
+            self.assertEqual(resp.status_code, 200)
+            self.assertContains(resp, "Night Drive")
+            cached = await view(self.factory.get(path))
+            self.assertEqual(cached["X-Page-Cache"], "hit")
+
+        resp = await views.acatalog(self.factory.get("/catalog/", {"q": "night"}))
+        self.assertContains(resp, "Night Drive")
+
+    async def test_track_detail_counts_view_once(self):
+        url = f"/track/{self.track.slug}/"
+        resp = await views.atrack_detail(self.factory.get(url, HTTP_USER_AGENT=self.UA), self.track.slug)
+        self.assertContains(resp, "Night Drive")
+        self.assertIn(seen.COOKIE_NAME, resp.cookies)
+
+        again = self.factory.get(url, HTTP_USER_AGENT=self.UA)
+        again.COOKIES[seen.COOKIE_NAME] = resp.cookies[seen.COOKIE_NAME].value
+        resp = await views.atrack_detail(again, self.track.slug)
+        self.assertNotIn(seen.COOKIE_NAME, resp.cookies)
+        self.assertEqual(counters.pending_for(self.track.pk)["view_count"], 1)
+
+        with self.assertRaises(views.Http404):
+            await views.atrack_detail(self.factory.get("/track/nope/"), "nope")
+
+    async def test_order_submission(self):
+        resp = await views.aorder_page(self.factory.get("/order/", {"track": self.track.pk, "license": "excl"}))
+        self.assertContains(resp, "Night Drive")
+
+        data = {
+            "name": "Bench", "contact": "@bench_user", "license_type": "exclusive", "track": self.track.pk,
+            "started": forms.make_started_token(time.time() - 10),
+        }
+        resp = await views.aorder_page(self.factory.post("/order/", data))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+        resp = await views.aorder_page(self.factory.post("/order/", {**data, "contact": ""}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(await models.Inquiry.objects.acount(), 1)
+
+    async def test_perf_middleware_sees_queries_from_orm_thread(self):
+        middleware = perf.PerfMiddleware(views.ahome)
+        resp = await middleware(self.factory.get("/"))
+        self.assertNotIn('desc="0 queries"', resp["Server-Timing"])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap")
+
+    def test_revalidation_is_304_without_rendering(self):
+        for url in ("/", "/catalog/", self.track.get_absolute_url(), "/sitemap.xml"):
+            first = self.client.get(url)
+            self.assertTrue(first["ETag"].startswith('W/"'))
+            self.assertIn("no-cache", first["Cache-Control"])
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(resp.status_code, 304, url)
+            self.assertLessEqual(len(queries), 1)
+            self.assertNotIn("X-Page-Cache", resp)
+            resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+            self.assertEqual(resp.status_code, 304, url)
+
+    def test_cold_track_revalidation_is_one_query(self):
+        url = self.track.get_absolute_url()
+        first = self.client.get(url)
+        cache.delete(views._track_meta_key(self.track.slug))
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_change_invalidates_validators(self):
+        first = self.client.get("/catalog/")
+        self.track.title = "Renamed"
+        self.track.save()
+        resp = self.client.get("/catalog/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Renamed")
+
+    def test_html_is_gzipped_including_cache_hits(self):
+        miss = self.client.get("/catalog/", HTTP_ACCEPT_ENCODING="gzip, br")
+        hit = self.client.get("/catalog/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(hit["X-Page-Cache"], "hit")
+        for resp in (miss, hit):
+            self.assertEqual(resp["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", resp["Vary"])
+        plain = self.client.get("/catalog/")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(gzip.decompress(hit.content), plain.content)
+
+
+class YoutubeFacadeTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU", is_featured=True)
+        other = Track.objects.create(title="Other", youtube_url="https://youtu.be/r-xwP7H6c0U")
+        RelatedTrack.objects.create(track=self.track, related=other, score=1)
+
+    def test_lists_render_thumbnails_instead_of_iframes(self):
+        for url in ("/", "/catalog/"):
+            html = self.client.get(url).content.decode()
+            self.assertNotIn("<iframe", html)
+            self.assertIn('data-yt-src="https://www.youtube-nocookie.com/embed/OfTm9MIVhqU?autoplay=1"', html)
+            self.assertIn('src="https://i.ytimg.com/vi/OfTm9MIVhqU/hqdefault.jpg"', html)
+            self.assertIn('loading="lazy"', html)
+            self.assertEqual(html.count("YouTube-фасад"), 1)  # скрипт — один на сторінку
+
+    def test_detail_keeps_single_player(self):
+        html = self.client.get(self.track.get_absolute_url()).content.decode()
+        self.assertEqual(html.count("<iframe"), 1)
+        self.assertIn("i.ytimg.com/vi/r-xwP7H6c0U/", html)  # схожі — лише превʼю
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class TrackCardCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.genre = Genre.objects.create(name="trap", slug="trap")
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+        self.track.genres.add(self.genre)
+
+    def test_card_is_reused_until_track_changes(self):
+        self.assertContains(self.client.get("/catalog/"), "Beat")
+        Track.objects.filter(pk=self.track.pk).update(title="Silent")  # без сигналів і без updated_at
+        self.assertContains(self.client.get("/catalog/"), "Beat")  # картка — з кешу фрагментів
+
+        self.track.refresh_from_db()
+        self.track.title = "Loud"
+        self.track.save()
+        self.assertContains(self.client.get("/catalog/"), "Loud")
+
+    def test_genre_changes_bump_card_version(self):
+        self.client.get("/catalog/")
+        self.genre.name = "Trap Soul"
+        self.genre.save()
+        self.assertContains(self.client.get("/catalog/"), "Trap Soul")
+
+        self.track.genres.add(Genre.objects.create(name="drill", slug="drill"))
+        self.assertContains(self.client.get("/catalog/"), "/catalog/?genre=drill", count=2)  # чіпс + картка
+        self.assertContains(self.client.get("/"), "Trap Soul")  # та сама картка на головній
+
+
+
+class TrackDailyStatTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.track = Track.objects.create(title="Beat", youtube_url="https://youtu.be/OfTm9MIVhqU")
+
+    def _row(self, day=None, period="d"):
+        return models.TrackDailyStat.objects.get(track=self.track, day=day or timezone.localdate(), period=period)
+
+    def test_upsert_accumulates_per_day(self):
+        stats.upsert({self.track.pk: {"views": 2}})
+        stats.upsert({self.track.pk: {"views": 3, "order_clicks": 1}})
+        row = self._row()
+        self.assertEqual((row.views, row.order_clicks), (5, 1))
+        self.assertEqual(models.TrackDailyStat.objects.count(), 1)
+
+    def test_counter_flush_and_inquiries_feed_stats(self):
+        for _ in range(3):
+            counters.record_view(self.track.pk)
+        counters.record_order_click(self.track.pk)
+        counters.flush()
+        models.Inquiry.objects.create(track=self.track, name="A", contact="@a", license_type="exclusive")
+        models.Inquiry.objects.create(track=self.track, name="B", contact="@b", license_type="exclusive_stems")
+        models.Inquiry.objects.create(name="C", contact="@c", license_type="exclusive")  # без треку — пропускаємо
+
+        row = self._row()
+        self.assertEqual((row.views, row.order_clicks), (3, 1))
+        self.assertEqual((row.inquiries_exclusive, row.inquiries_exclusive_stems), (1, 1))
+
+    def test_compact_rolls_old_days_into_months(self):
+        stats.upsert({self.track.pk: {"views": 1}}, day=date(2025, 1, 5))
+        stats.upsert({self.track.pk: {"views": 2}}, day=date(2025, 1, 20))
+        stats.upsert({self.track.pk: {"views": 4}}, day=date(2025, 2, 1))
+        stats.upsert({self.track.pk: {"views": 8}})
+
+        self.assertEqual(stats.compact(date(2025, 3, 1)), 3)
+        self.assertEqual(self._row(date(2025, 1, 1), "m").views, 3)
+        self.assertEqual(self._row(date(2025, 2, 1), "m").views, 4)
+        self.assertEqual(self._row().views, 8)
+
+        call_command("compact_stats", stdout=StringIO())  # повторний запуск нічого не ламає
+        self.assertEqual(models.TrackDailyStat.objects.count(), 3)
+
+    def test_admin_stats_view(self):
+        from django.contrib.auth.models import User
+
+        stats.upsert({self.track.pk: {"views": 7, "order_clicks": 2, "inquiries_exclusive": 1}})
+        self.assertEqual(self.client.get("/admin/tracks/track/stats/").status_code, 302)
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "x"))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/admin/tracks/track/stats/?days=7")
+        self.assertContains(resp, "Beat")
+        self.assertEqual(resp.context["totals"]["views"], 7)
+        self.assertFalse([q for q in ctx.captured_queries if "tracks_inquiry" in q["sql"]])
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class GenreFacetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.a = Track.objects.create(title="Alpha", youtube_url="https://youtu.be/OfTm9MIVhqU", description="trap, female, dark")
+        self.b = Track.objects.create(title="Bravo", youtube_url="https://youtu.be/r-xwP7H6c0U", description="trap, female")
+        self.c = Track.objects.create(title="Charlie", youtube_url="https://youtu.be/dQw4w9WgXcQ", description="drill, dark")
+
+    def _titles(self, url):
+        return sorted(t.title for t in self.client.get(url).context["tracks"])
+
+    def _chips(self, resp):
+        return {c["genre"].slug: c["count"] for c in resp.context["primary_chips"] + resp.context["other_chips"]}
+
+    def test_and_or_filters_and_counts(self):
+        self.assertEqual(self._titles("/catalog/?genre=trap&genre=dark"), ["Alpha"])
+        self.assertEqual(self._titles("/catalog/?genre=trap&genre=dark&mode=or"), ["Alpha", "Bravo", "Charlie"])
+        self.assertEqual(self._titles("/catalog/?genre=trap&genre=nope"), ["Alpha", "Bravo"])
+
+        resp = self.client.get("/catalog/?genre=trap")
+        self.assertEqual(self._chips(resp), {"female": 2, "trap": 2, "dark": 1, "drill": 0})
+        self.assertContains(resp, 'href="/catalog/?genre=trap&amp;genre=dark"')
+        self.assertContains(resp, 'href="/catalog/"')  # повторний клік по trap знімає фільтр
+
+        resp = self.client.get("/catalog/?genre=trap&mode=or")
+        self.assertEqual(self._chips(resp)["drill"], 3)
+
+    def test_counts_follow_search(self):
+        resp = self.client.get("/catalog/?q=alpha&genre=trap&genre=female")
+        self.assertEqual([t.title for t in resp.context["tracks"]], ["Alpha"])
+        self.assertEqual(self._chips(resp), {"female": 1, "trap": 1, "dark": 1, "drill": 0})
+
+    def test_index_is_in_memory_until_catalog_changes(self):
+        trap = genre_registry.get("trap")
+        facets.index.bits()
+        with self.assertNumQueries(0):
+            self.assertEqual(facets.index.counts([trap.pk])[trap.pk], 2)
+        self.c.genres.add(trap)  # m2m → нова версія каталогу → індекс перечитується
+        self.assertEqual(facets.index.counts([trap.pk])[trap.pk], 3)
+
+    def test_index_reloads_when_another_process_bumps_the_version(self):
+        facets.index.bits()
+        with multiprocessing.get_context("fork").Pool(1) as pool:  # save в іншому воркері
+            pool.apply(pagecache.bump_catalog_version)
+        with self.assertNumQueries(1):
+            facets.index.bits()
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# під ASGI (config/asgi.py) — async-версії сторінок, під WSGI — звичайні
+ASYNC = settings.ASYNC_VIEWS
+
 urlpatterns = [
-    path('', views.home, name='home'),  # головна
-    path("catalog/", views.catalog, name="catalog"),  # каталог з фільтрами
-    path('order/', views.order_page, name='order_page'),
+    path('', views.ahome if ASYNC else views.home, name='home'),  # головна
+    path("catalog/", views.acatalog if ASYNC else views.catalog, name="catalog"),  # каталог з фільтрами
+    path('order/', views.aorder_page if ASYNC else views.order_page, name='order_page'),
     path('order/thanks/', views.order_thanks, name='order_thanks'),
-    path("track/<slug:slug>/", views.track_detail, name="track_detail"),
-    path("track/<slug:slug>/", views.track_detail, name="track_detail"),
+    path("track/<slug:slug>/", views.atrack_detail if ASYNC else views.track_detail, name="track_detail"),
+    path("track/<int:pk>/order-click/", views.order_click, name="order_click"),
     path("how-it-works/", views.how_it_works, name="how_it_works"),
 ]
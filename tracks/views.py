@@ -1,18 +1,23 @@
-import time
+from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
-from django.core.paginator import Paginator
-from django.db.models import Count
-from django.db.models import Q, F
-from django.http import HttpResponseBadRequest
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+from . import counters, facets, search
 from .forms import InquiryForm
-from .models import Track, Genre
-from .notify import notify_telegram
-
-VIEW_COOLDOWN = 60 * 60  # 1 година
+from .genres import is_primary_genre, registry as genre_registry
+from .models import RelatedTrack, Track
+from .notify import enqueue_telegram
+from .pagecache import catalog_version, conditional_page, versioned_page_cache
+from .pagination import KeysetPaginator, RankedPaginator
+from .ratelimit import ratelimit
+from .seen import CLICKS_COOKIE_NAME, SeenTracks, is_bot
 
 GENDER_SLUGS = {"female", "male"}
 
@@ -24,45 +29,146 @@ LICENSE_MAP = {
 
 PAGE_SIZE_DEFAULT = 21
 
+# повний унікальний порядок каталогу — ключ для курсорів
+CATALOG_ORDERING = ("-is_featured", "-created_at", "id")
+
+
+# з якого розміру жанру фільтрувати через EXISTS (скан індексу сортування, без сортування
+# всього жанру); малі жанри дешевше взяти з through-таблиці і відсортувати
+GENRE_EXISTS_THRESHOLD = 500
+
+
+def _filter_genre(qs, genre):
+    if genre.track_count >= GENRE_EXISTS_THRESHOLD:
+        through = Track.genres.through.objects.filter(track_id=OuterRef("pk"), genre_id=genre.pk)
+        return qs.filter(Exists(through))
+    return qs.filter(genres=genre)
+
+
+def _genre_selection(request):
+    """Обрані жанри (?genre=a&genre=b; невідомі slug-и — мимо) і режим ?mode=and|or."""
+    genres = [g for g in map(genre_registry.get, dict.fromkeys(request.GET.getlist("genre"))) if g]
+    mode = request.GET.get("mode")
+    return genres, mode if mode in facets.MODES else "and"
+
+
+def _filter_genres(qs, genres, mode):
+    if mode == "or" and len(genres) > 1:
+        through = Track.genres.through.objects.filter(
+            track_id=OuterRef("pk"), genre_id__in=[g.pk for g in genres]
+        )
+        return qs.filter(Exists(through))
+    for genre in genres:  # AND — окремий фільтр на кожен жанр
+        qs = _filter_genre(qs, genre)
+    return qs
+
+
+def _selection_key(genres, mode):
+    if not genres:
+        return "all"
+    key = "-".join(sorted(str(g.pk) for g in genres))
+    return f"{key}:{mode}" if len(genres) > 1 else key
+
+
+def _genre_query(slugs, mode, query=""):
+    params = [("genre", slug) for slug in slugs]
+    if mode == "or":
+        params.append(("mode", mode))
+    if query:
+        params.append(("q", query))
+    return urlencode(params)
+
+
+def _genre_context(genres, mode, query="", within=None):
+    """
+    Чіпси primary/other: кожен — перемикач свого жанру в поточному фільтрі і
+    кількість треків, що лишиться з ним (facets — з бітсетів, без запитів).
+    """
+    selected = [g.slug for g in genres]
+    counts = facets.index.counts([g.pk for g in genres], mode, within)
+
+    def chip(genre):
+        active = genre.slug in selected
+        slugs = [s for s in selected if s != genre.slug] if active else selected + [genre.slug]
+        params = _genre_query(slugs, mode, query)
+        return {
+            "genre": genre,
+            "count": counts.get(genre.pk, 0),
+            "active": active,
+            "url": f"/catalog/?{params}" if params else "/catalog/",
+        }
+
+    return {
+        "active_genres": genres,
+        "active_genre": genres[0] if len(genres) == 1 else None,
+        "genre_mode": mode,
+        "genre_query": _genre_query(selected, mode),
+        # чіпси зверху: спершу female/male, далі решта (лише жанри з треками)
+        "primary_chips": [chip(g) for g in genre_registry.primary()],
+        "other_chips": [chip(g) for g in genre_registry.other()],
+        "open_all_genres": any(not is_primary_genre(g) for g in genres),
+    }
+
 
 def how_it_works(request):
     return render(request, "tracks/how_it_works.html")
 
-def catalog(request):
+def _catalog_context(request):
     # Базовий queryset
     qs = (
         Track.objects.all()
-        .order_by("-is_featured", "-created_at")  # або як тобі треба
+        .order_by(*CATALOG_ORDERING)
         .prefetch_related("genres")
     )
 
-    # Фільтр за жанром (опційно)
-    genre_slug = request.GET.get("genre")
-    active_genre = None
-    if genre_slug:
-        active_genre = Genre.objects.filter(slug=genre_slug).first()
-        if active_genre:
-            qs = qs.filter(genres=active_genre)
-
-    # Пагінація: 20 на сторінку
-    paginator = Paginator(qs, 21)
-    page_number = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page_number)  # зручно: сам ловить помилки і дає валідну сторінку
-
-    context = {
+    # Фільтр за жанрами (опційно, кілька — AND або OR) — жанри з реєстру, без запиту
+    genres, mode = _genre_selection(request)
+    qs = _filter_genres(qs, genres, mode)
+
+    # Пошук ?q= — FTS5, за релевантністю; інакше keyset-пагінація по 21 (старі ?page=N теж працюють)
+    query = request.GET.get("q", "").strip()
+    within = None
+    if search.build_match(query):
+        version = catalog_version()
+        # within — усі збіги, не лише RESULTS_LIMIT ранжованих: з них фасети і «з Z»
+        within = search.cached_matches(query, version)
+        selected = facets.index.select([g.pk for g in genres], mode)
+        if len(genres) == 1:
+            ids = search.cached_ranked_ids(query, genres[0].pk, version)  # жанр — прямо у FTS, до ліміту
+        else:
+            found = search.cached_ranked_ids(query, None, version)
+            ids = found if selected is None else [pk for pk in found if facets.contains(selected, pk)]
+        total = (within if selected is None else within & selected).bit_count()
+        paginator = RankedPaginator(qs, ids, PAGE_SIZE_DEFAULT, total=total)
+    else:
+        query = ""
+        paginator = KeysetPaginator(
+            qs, CATALOG_ORDERING, PAGE_SIZE_DEFAULT,
+            count_key=f"catalog:{catalog_version()}:{_selection_key(genres, mode)}",
+        )
+    page_obj = paginator.page(request.GET.get("cursor"), request.GET.get("page"))
+
+    return {
         "page_obj": page_obj,
         "tracks": page_obj.object_list,  # ← ВАЖЛИВО: у шаблон йдуть лише елементи поточної сторінки
         "paginator": paginator,
-        "genres": Genre.objects.all().order_by("name"),  # чіпси зверху
-        "active_genre": active_genre,
+        "query": query,
+        **_genre_context(genres, mode, query, within),
     }
-    return render(request, "tracks/track_list.html", context)
 
 
+@conditional_page()
+@versioned_page_cache()
+def catalog(request):
+    return render(request, "tracks/track_list.html", _catalog_context(request))
+
+
+@conditional_page()
+@versioned_page_cache()
 def home(request):
-    featured = Track.objects.filter(is_featured=True).order_by("-created_at")[:6]
-    latest = Track.objects.order_by("-created_at")[:6]
-    top_genres = Genre.objects.annotate(n=Count("tracks")).order_by("-n", "name")[:12]
+    featured = Track.objects.filter(is_featured=True).order_by("-created_at").prefetch_related("genres")[:6]
+    latest = Track.objects.order_by("-created_at").prefetch_related("genres")[:6]
+    top_genres = genre_registry.top(12)  # Genre.track_count, без агрегації
     return render(request, "tracks/home.html", {
         "featured": featured,
         "latest": latest,
@@ -70,50 +176,22 @@ def home(request):
     })
 
 
-PRIMARY_TOKENS = {"female", "male"}  # що вважати «основними» жанрами
-
-def is_primary_genre(g):
-    slug = (g.slug or "").strip().lower()
-    name = (g.name or "").strip().lower()
-    return slug in PRIMARY_TOKENS or name in PRIMARY_TOKENS
-
 def track_list(request):
-    genre_slug = request.GET.get("genre")
-
     tracks_qs = (
         Track.objects.all()
         .prefetch_related("genres")
-        .order_by("-created_at")
     )
 
-    active_genre = None
-    if genre_slug:
-        active_genre = Genre.objects.filter(slug=genre_slug).first()
-        if active_genre:
-            tracks_qs = tracks_qs.filter(genres=active_genre).distinct()
-
-    paginator = Paginator(tracks_qs, 20)
-    page_obj = paginator.get_page(request.GET.get("page"))
+    genres, mode = _genre_selection(request)
+    tracks_qs = _filter_genres(tracks_qs, genres, mode)
 
-    # беремо тільки жанри, які реально прив’язані до треків
-    all_genres = (
-        Genre.objects.filter(tracks__isnull=False)
-        .distinct()
-        .order_by("name")
+    paginator = KeysetPaginator(
+        tracks_qs, ("-created_at", "-id"), 20,
+        count_key=f"track_list:{catalog_version()}:{_selection_key(genres, mode)}",
     )
+    page_obj = paginator.page(request.GET.get("cursor"), request.GET.get("page"))
 
-    # основні (male/female) — по slug або name
-    def is_primary(g):
-        s = (g.slug or "").lower()
-        n = (g.name or "").lower()
-        return s in ("male", "female") or n in ("male", "female")
-
-    primary_genres = [g for g in all_genres if is_primary(g)]
-    other_genres   = [g for g in all_genres if not is_primary(g)]
-
-    # якщо активний жанр у “інших”, розкриємо їх зразу
-    open_all_genres = bool(active_genre and not is_primary(active_genre))
-
+    # чіпси (male/female та інші) — з реєстру, лічильники — з фасетного індексу
     return render(
         request,
         "tracks/track_list.html",
@@ -121,70 +199,54 @@ def track_list(request):
             "tracks": page_obj,
             "page_obj": page_obj,
             "paginator": paginator,
-
-            "active_genre": active_genre,
-            "primary_genres": primary_genres,
-            "other_genres": other_genres,
-            "open_all_genres": open_all_genres,
+            **_genre_context(genres, mode),
         },
     )
 
-def order_page(request):
-    """Форма замовлення з anti-bot, rate-limit, та префілом треку/ліцензії з query."""
-    # ---- Rate limit: не більше 5 POST за 10 хв з IP
-    if request.method == "POST":
-        ip = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0] or request.META.get("REMOTE_ADDR")
-        key = f"order_rate:{ip}"
-        hits = cache.get(key, 0) + 1
-        cache.set(key, hits, timeout=60 * 10)  # 10 хв
-        if hits > 5:
-            return HttpResponseBadRequest("Забагато спроб. Спробуй пізніше, братан.")
+def _save_inquiry(form):
+    inquiry = form.save()
+    # Телега — лише в чергу, відправить фоновий sender (tracks/notify.py)
+    enqueue_telegram(
+        "🚨 <b>Нова заявка</b>\n"
+        f"🎵 Трек: {inquiry.track.title if inquiry.track else '—'}\n"
+        f"👤 Ім’я: {inquiry.name}\n"
+        f"📬 Контакт: {inquiry.contact}\n"
+        f"🧾 Ліцензія: {inquiry.get_license_type_display()}\n"
+        f"💬 Повідомлення: {inquiry.message[:500] or '—'}"
+    )
+    return inquiry
 
-    # ---- GET: ставимо мітку часу (anti-bot)
-    if request.method == "GET":
-        request.session["order_started_at"] = int(time.time())
 
+def _order_initial(request, track):
+    initial = {}
+    if track:
+        initial["track"] = track
+    # Префіл ліцензії з ?license=
+    lic_qs = request.GET.get("license")
+    if lic_qs in LICENSE_MAP:
+        initial["license_type"] = LICENSE_MAP[lic_qs]
+    return initial
+
+
+@ratelimit("5/10m", scope="order")  # не більше 5 POST за 10 хв з IP — спільно для всіх воркерів
+def order_page(request):
+    """Форма замовлення з anti-bot, rate-limit, та префілом треку/ліцензії з query."""
     # ---- Витягуємо трек (із GET або POST)
     track_id = request.GET.get("track") if request.method == "GET" else request.POST.get("track")
     track = get_object_or_404(Track, id=track_id) if track_id else None
 
     if request.method == "POST":
-        # Anti-bot: занадто швидкий сабміт
-        started = int(request.session.get("order_started_at", 0))
-        if started and time.time() - started < 3:
-            return HttpResponseBadRequest("Здається, бот. Заповнюй форму не так блискавично :)")
-
+        # Anti-bot (занадто швидкий сабміт, honeypot) — у InquiryForm, без сесії
         form = InquiryForm(request.POST)
         if form.is_valid():
-            inquiry = form.save()
-
-            # Телега — як у тебе було
-            msg = (
-                "🚨 <b>Нова заявка</b>\n"
-                f"🎵 Трек: {inquiry.track.title if inquiry.track else '—'}\n"
-                f"👤 Ім’я: {inquiry.name}\n"
-                f"📬 Контакт: {inquiry.contact}\n"
-                f"🧾 Ліцензія: {inquiry.get_license_type_display()}\n"
-                f"💬 Повідомлення: {inquiry.message[:500] or '—'}"
-            )
-            notify_telegram(msg)
-
+            inquiry = _save_inquiry(form)
             return redirect(reverse("order_thanks") + f"?id={inquiry.id}")
         else:
             # впав валідатор — відмалюємо з помилками
             return render(request, "tracks/order_page.html", {"form": form, "track": track})
 
     # ---- GET: готуємо початкові значення форми
-    initial = {}
-    if track:
-        initial["track"] = track
-
-    # Префіл ліцензії з ?license=
-    lic_qs = request.GET.get("license")
-    if lic_qs in LICENSE_MAP:
-        initial["license_type"] = LICENSE_MAP[lic_qs]
-
-    form = InquiryForm(initial=initial)
+    form = InquiryForm(initial=_order_initial(request, track))
     return render(request, "tracks/order_page.html", {"form": form, "track": track})
 
 
@@ -192,28 +254,172 @@ def order_thanks(request):
     return render(request, "tracks/order_thanks.html")
 
 
+def _track_meta_key(slug):
+    return f"track:meta:{catalog_version()}:{slug}"
+
+
+def _track_meta(slug):
+    """(pk, updated_at) треку або None — один запит на версію каталогу, далі з кешу."""
+    return cache.get_or_set(
+        _track_meta_key(slug),
+        lambda: Track.objects.filter(slug=slug).values_list("pk", "updated_at").first(),
+        60 * 60,
+    )
+
+
+def _track_last_modified(request, slug):
+    meta = _track_meta(slug)
+    return meta[1] if meta else None
+
+
+def _new_view(request, track_id):
+    """SeenTracks, якщо перегляд треба рахувати, інакше None (бот, вже бачив, нема треку)."""
+    if not track_id or is_bot(request):
+        return None
+    seen = SeenTracks.from_request(request)  # підписана кукі, без сесії
+    return seen if seen.add(track_id) else None
+
+
 def track_detail(request, slug):
+    # перегляд рахуємо до кешу сторінки: лічильник і кукі — поза кешованим HTML
+    meta = _track_meta(slug)
+    track_id = meta[0] if meta else None
+    seen = _new_view(request, track_id)
+    if seen is not None:
+        counters.record_view(track_id)
+    response = _track_detail_page(request, slug)
+    if seen is not None:
+        seen.set_cookie(response)
+    return response
+
+
+@conditional_page(_track_last_modified)  # 304 — до кешу сторінок і до view
+@versioned_page_cache()
+def _track_detail_page(request, slug):
     track = get_object_or_404(Track.objects.prefetch_related("genres"), slug=slug)
+    related = [link.related for link in _related_links(track)]
+    return render(request, "tracks/track_detail.html", _track_detail_context(track, related))
 
-    viewed = request.session.get("viewed_tracks", {})  # { "id": ts }
-    now = int(time.time())
-    last = int(viewed.get(str(track.id), 0))
-    if now - last > VIEW_COOLDOWN:
-        Track.objects.filter(pk=track.pk).update(view_count=F("view_count") + 1)
-        viewed[str(track.id)] = now
-        request.session["viewed_tracks"] = viewed
 
-    gender_tags = [g for g in track.genres.all() if g.slug in GENDER_SLUGS]
-    other_tags = [g for g in track.genres.all() if g.slug not in GENDER_SLUGS]
+def _related_links(track):
+    # передпораховані «схожі» (tracks/related.py) — один індексний запит
+    return RelatedTrack.objects.filter(track=track).select_related("related").order_by("-score")[:6]
 
-    related = (Track.objects
-               .filter(~Q(id=track.id), genres__in=track.genres.all())
-               .distinct()
-               .order_by("-is_featured", "-created_at")[:6])
 
-    return render(request, "tracks/track_detail.html", {
+def _track_detail_context(track, related):
+    return {
         "track": track,
-        "gender_tags": gender_tags,
-        "other_tags": other_tags,
+        "gender_tags": [g for g in track.genres.all() if g.slug in GENDER_SLUGS],
+        "other_tags": [g for g in track.genres.all() if g.slug not in GENDER_SLUGS],
         "related": related,
+    }
+
+
+def _track_exists(pk):
+    return cache.get_or_set(
+        f"track:exists:{catalog_version()}:{pk}",
+        lambda: Track.objects.filter(pk=pk).exists(),
+        60 * 60,
+    )
+
+
+@csrf_exempt
+@require_POST
+@ratelimit("30/m", scope="order_click")
+def order_click(request, pk):
+    """
+    Клік «Замовити» (navigator.sendBeacon): лише інкремент у буфері, без запису в БД.
+    Рахуємо раз на годину на трек для браузера — та сама підписана кукі, що й для
+    переглядів, лише своя; боти й невідомі треки — мимо.
+    """
+    if not _track_exists(pk):
+        raise Http404("No Track matches the given query.")
+    response = HttpResponse(status=204)
+    if is_bot(request):
+        return response
+    seen = SeenTracks.from_request(request, name=CLICKS_COOKIE_NAME)
+    if seen.add(pk):
+        counters.record_order_click(pk)
+        seen.set_cookie(response)
+    return response
+
+
+# ---- ASGI: async-версії публічних сторінок (config/asgi.py вмикає їх через ASYNC_VIEWS).
+# ORM — через async API (aget, afirst, async for), решта синхронного (реєстр жанрів,
+# пагінатори, лічильники, ModelForm) — sync_to_async з thread_sensitive=True за замовчуванням:
+# їм потрібне те саме з'єднання з БД, що й ORM. Шаблони рендеряться в event loop, тож у
+# контекст ідуть лише вже вибрані списки (prefetch_related відпрацьовує в async for).
+
+@conditional_page()
+@versioned_page_cache()
+async def ahome(request):
+    featured = Track.objects.filter(is_featured=True).order_by("-created_at").prefetch_related("genres")[:6]
+    latest = Track.objects.order_by("-created_at").prefetch_related("genres")[:6]
+    top_genres = await sync_to_async(genre_registry.top)(12)
+    return render(request, "tracks/home.html", {
+        "featured": [t async for t in featured],
+        "latest": [t async for t in latest],
+        "top_genres": top_genres,
     })
+
+
+@conditional_page()
+@versioned_page_cache()
+async def acatalog(request):
+    # пагінатор і FTS — синхронні; один перехід у потік на весь контекст, а не на кожен запит
+    def load():
+        context = _catalog_context(request)
+        context["paginator"].count  # «з Z» у шаблоні — COUNT(*) теж тут, а не під час рендеру
+        return context
+
+    context = await sync_to_async(load)()
+    return render(request, "tracks/track_list.html", context)
+
+
+async def atrack_detail(request, slug):
+    key = _track_meta_key(slug)
+    meta = cache.get(key)  # LocMem — без I/O, можна прямо з event loop
+    if meta is None:
+        meta = await Track.objects.filter(slug=slug).values_list("pk", "updated_at").afirst()
+        cache.add(key, meta, 60 * 60)
+    track_id = meta[0] if meta else None
+    seen = _new_view(request, track_id)
+    if seen is not None:
+        await sync_to_async(counters.record_view)(track_id)  # запис у спільний SQLite-файл — не з event loop
+    response = await _atrack_detail_page(request, slug)
+    if seen is not None:
+        seen.set_cookie(response)
+    return response
+
+
+@conditional_page(_track_last_modified)  # 304 — до кешу сторінок і до view
+@versioned_page_cache()
+async def _atrack_detail_page(request, slug):
+    try:
+        track = await Track.objects.prefetch_related("genres").aget(slug=slug)
+    except Track.DoesNotExist:
+        raise Http404("No Track matches the given query.")
+    related = [link.related async for link in _related_links(track)]
+    return render(request, "tracks/track_detail.html", _track_detail_context(track, related))
+
+
+@ratelimit("5/10m", scope="order")
+async def aorder_page(request):
+    track_id = request.GET.get("track") if request.method == "GET" else request.POST.get("track")
+    track = None
+    if track_id:
+        try:
+            track = await Track.objects.aget(id=track_id)
+        except Track.DoesNotExist:
+            raise Http404("No Track matches the given query.")
+
+    if request.method == "POST":
+        form = InquiryForm(request.POST)
+        # валідація (ModelChoiceField іде в БД) і збереження — одним переходом у потік ORM
+        inquiry = await sync_to_async(lambda: form.is_valid() and _save_inquiry(form))()
+        if inquiry:
+            return redirect(reverse("order_thanks") + f"?id={inquiry.id}")
+        return render(request, "tracks/order_page.html", {"form": form, "track": track})
+
+    form = InquiryForm(initial=_order_initial(request, track))
+    return render(request, "tracks/order_page.html", {"form": form, "track": track})